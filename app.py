@@ -12,14 +12,22 @@ Funcionalidades principais:
 - Dashboard web para visualização de dados
 """
 
+import functools
 import os
 from flask import Flask
-from dotenv import load_dotenv
+from jinja2 import FileSystemBytecodeCache
 
-from extensions import db
-from services.scheduler import init_scheduler
+from env_cache import load_env_once
+from extensions import db, engine_options
+from services.scheduler import init_scheduler, set_reloader_active
 from flask_login import LoginManager
 from models.usuario import Usuario
+from utils.json_provider import OrjsonProvider
+
+try:  # gevent é opcional: só presente com o worker gunicorn -k gevent
+    from gevent import monkey as _gevent_monkey
+except ImportError:
+    _gevent_monkey = None
 
 
 def create_app():
@@ -27,21 +35,40 @@ def create_app():
     Factory function para criação da aplicação Flask.
     
     Configura a aplicação, inicializa extensões e registra blueprints.
+    Continua uma função simples (o Flask CLI só descobre factories que passam
+    em ``inspect.isfunction``); para reaproveitar a instância, use ``get_app()``.
     
     Returns:
         Flask: Instância configurada da aplicação
     """
     # Carrega variáveis de ambiente
-    load_dotenv()
+    load_env_once()
     
     # Cria instância da aplicação
     app = Flask(__name__)
+    # jsonify via orjson (fallback automático para o json da stdlib)
+    app.json = OrjsonProvider(app)
+    # Clientes (Alexa, dashboard JS) não dependem de chaves ordenadas nem indentação
+    app.json.sort_keys = False
+    app.json.compact = True
     
     # Configurações da aplicação
     app.secret_key = os.getenv('SECRET_KEY', 'dev-key-change-in-production')
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///solarmind.db'
+    app.config['SQLALCHEMY_DATABASE_URI'] = _database_uri()
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+
+    # Templates: só verifica alterações em disco (stat por render) em modo debug
+    app.config['TEMPLATES_AUTO_RELOAD'] = app.debug
+    app.jinja_env.auto_reload = app.debug
+    # Cache em disco do bytecode dos templates, compartilhado entre workers.
+    # Persista instance/jinja_cache entre rebuilds do container para aproveitá-lo.
+    jinja_cache_dir = os.path.join(app.instance_path, 'jinja_cache')
+    os.makedirs(jinja_cache_dir, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory=jinja_cache_dir, pattern='%s.cache')
     
+    _patch_green_db_driver(app.config['SQLALCHEMY_DATABASE_URI'])
+
     # Inicializa extensões
     db.init_app(app)
     # Flask-Login
@@ -67,24 +94,11 @@ def create_app():
         except Exception:
             return None
     
-    # Importa e registra blueprints
-    from routes.api import api_bp
-    from routes.auth import auth_bp
-    from routes.dashboard import dash_bp
-    from routes.main import main_bp
-    from routes.estatisticas import estatisticas_bp
-    from routes.aparelhos import aparelhos_bp
-    from routes.alexa import alexa_bp
-    from routes.chat import chat_bp
-    
-    app.register_blueprint(api_bp)
-    app.register_blueprint(auth_bp)
-    app.register_blueprint(dash_bp)
-    app.register_blueprint(main_bp)
-    app.register_blueprint(aparelhos_bp)
-    app.register_blueprint(estatisticas_bp)
-    app.register_blueprint(alexa_bp)
-    app.register_blueprint(chat_bp)
+    # Registra blueprints (módulos de rotas carregados sob demanda pelo pacote routes)
+    import routes
+    for name in routes.BLUEPRINTS:
+        app.register_blueprint(getattr(routes, name))
+    routes.register_lazy_views(app)
 
     # Inicializa Scheduler (APScheduler)
     with app.app_context():
@@ -103,10 +117,75 @@ def create_app():
         except Exception as e:
             print(f"[WARN] Falha ao criar tabelas: {e}")
         init_scheduler(app)
+
+    # Pré-compila os templates no boot (útil com vários workers gunicorn)
+    if os.getenv('PRECOMPILE_TEMPLATES') == '1':
+        _precompile_templates(app)
     
     return app
 
 
+@functools.lru_cache(maxsize=1)
+def get_app():
+    """
+    App do processo, criado na primeira chamada e reaproveitado nas seguintes.
+
+    Scripts (ex: init_db.py) usam este acessor para não registrar blueprints
+    e iniciar o scheduler de novo. Para obter um app novo (testes), use
+    ``get_app.cache_clear()``.
+    """
+    return create_app()
+
+
+def _database_uri():
+    """DATABASE_URL (como em config.py), com SQLite local como padrão."""
+    uri = os.getenv('DATABASE_URL', 'sqlite:///solarmind.db')
+    # Heroku e similares ainda exportam o esquema antigo, recusado pelo SQLAlchemy 2
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def _patch_green_db_driver(uri):
+    """
+    Torna o psycopg2 cooperativo quando o processo roda sob gevent.
+
+    O worker gevent do gunicorn já aplica ``monkey.patch_all()`` antes de
+    carregar o app, mas o psycopg2 (extensão C) continuaria bloqueando o
+    event loop inteiro durante cada query sem o patch do psycogreen.
+    """
+    if not uri.startswith('postgresql') or _gevent_monkey is None:
+        return
+    if not _gevent_monkey.is_module_patched('socket'):
+        return
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        print("[WARN] gevent ativo sem psycogreen: queries PostgreSQL bloqueiam o worker")
+        return
+    patch_psycopg()
+
+
+def _precompile_templates(app):
+    """Compila todos os templates para popular o cache do Jinja antes do 1º request."""
+    for template_name in app.jinja_env.list_templates():
+        try:
+            app.jinja_env.get_template(template_name)
+        except Exception as e:
+            print(f"[WARN] Falha ao pré-compilar template {template_name}: {e}")
+
+
 if __name__ == "__main__":
-    app = create_app()
-    app.run(debug=False, host='0.0.0.0', port=5000)
\ No newline at end of file
+    load_env_once()
+    # Reloader do Werkzeug é opt-in (FLASK_RELOAD=1): ele reexecuta todo o boot
+    # em um segundo interpretador. Avisado antes do boot para que o scheduler
+    # só inicie no processo filho.
+    use_reloader = os.getenv('FLASK_RELOAD', '0') == '1'
+    set_reloader_active(use_reloader)
+    app = get_app()
+    app.run(
+        debug=False,
+        use_reloader=use_reloader,
+        host='0.0.0.0',
+        port=5000
+    )
\ No newline at end of file
@@ -1,7 +1,6 @@
 
 import os
-from dotenv import load_dotenv
-from services.goodwe_client import GoodWeClient
+from env_cache import load_env_once
 from utils.logger import get_logger
 
 # Configurar logger
@@ -12,7 +11,7 @@ def test_goodwe_login():
     Testa o login na API GoodWe SEMS e imprime o resultado.
     """
     # Carregar variáveis de ambiente do arquivo .env
-    load_dotenv()
+    load_env_once()
     logger.info("Variáveis de ambiente carregadas.")
 
     # Obter credenciais do ambiente
@@ -29,6 +28,9 @@ def test_goodwe_login():
 
     logger.info(f"Tentando login com a conta: {account} na região: {login_region}")
 
+    # Import tardio: requests/urllib3 só são carregados se houver credenciais
+    from services.goodwe_client import GoodWeClient
+
     # Instanciar o cliente
     client = GoodWeClient(region=login_region)
 
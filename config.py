@@ -5,29 +5,36 @@ Define as configurações de ambiente para desenvolvimento,
 teste e produção da aplicação.
 """
 
+import functools
 import os
-from dotenv import load_dotenv
+from env_cache import load_env_once
 
-# Carrega variáveis de ambiente do arquivo .env
-load_dotenv()
+# Carrega variáveis de ambiente do arquivo .env (uma única vez por processo)
+load_env_once()
+
+
+@functools.lru_cache(maxsize=None)
+def _env(key, default=None):
+    """Lê uma variável de ambiente uma única vez (use _env.cache_clear() em testes)."""
+    return os.getenv(key, default)
 
 
 class Config:
     """Configuração base da aplicação."""
     
     # Chave secreta para sessões e segurança
-    SECRET_KEY = os.getenv('SECRET_KEY', 'dev-key-change-in-production')
+    SECRET_KEY = _env('SECRET_KEY', 'dev-key-change-in-production')
     
     # Configurações do banco de dados
-    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///solarmind.db')
+    SQLALCHEMY_DATABASE_URI = _env('DATABASE_URL', 'sqlite:///solarmind.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
     # Configurações de debug
-    DEBUG = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
+    DEBUG = _env('FLASK_DEBUG', 'False').lower() == 'true'
     
     # Configurações IFTTT (se necessário)
-    IFTTT_WEBHOOK_URL = os.getenv('IFTTT_WEBHOOK_URL')
-    IFTTT_KEY = os.getenv('IFTTT_KEY')
+    IFTTT_WEBHOOK_URL = _env('IFTTT_WEBHOOK_URL')
+    IFTTT_KEY = _env('IFTTT_KEY')
 
 
 class DevelopmentConfig(Config):
@@ -38,7 +45,7 @@ class DevelopmentConfig(Config):
 class ProductionConfig(Config):
     """Configuração para ambiente de produção."""
     DEBUG = False
-    SECRET_KEY = os.getenv('SECRET_KEY')  # Obrigatório em produção
+    SECRET_KEY = _env('SECRET_KEY')  # Obrigatório em produção
 
 
 class TestingConfig(Config):
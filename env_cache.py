@@ -0,0 +1,29 @@
+"""
+Carregamento único do arquivo .env
+
+Vários módulos (app factory, config, clientes e scripts) precisam das
+variáveis do .env. Este helper garante que o arquivo seja lido apenas uma
+vez por processo e também em processos filhos (ex: reloader do Werkzeug),
+que herdam o ambiente já carregado.
+"""
+
+import functools
+import os
+
+from dotenv import load_dotenv
+
+_FLAG = '_DOTENV_LOADED'
+
+
+@functools.lru_cache(maxsize=1)
+def load_env_once() -> bool:
+    """
+    Carrega o .env na primeira chamada; chamadas seguintes são no-op.
+
+    Returns:
+        bool: True (permite uso em expressões)
+    """
+    if not os.environ.get(_FLAG):
+        load_dotenv()
+        os.environ[_FLAG] = '1'
+    return True
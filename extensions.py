@@ -5,11 +5,79 @@ Inicialização das extensões Flask utilizadas pela aplicação.
 As extensões são inicializadas aqui e configuradas no app factory.
 """
 
-from flask_sqlalchemy import SQLAlchemy
 import logging
 
-# Instância do SQLAlchemy para ORM
-db = SQLAlchemy()
+
+# PRAGMAs aplicados a cada nova conexão SQLite (banco de desenvolvimento):
+# WAL + synchronous=NORMAL evitam um fsync por commit (seed, coletas, toggles).
+SQLITE_PRAGMAS = (
+	'PRAGMA journal_mode=WAL',
+	'PRAGMA synchronous=NORMAL',
+	'PRAGMA temp_store=MEMORY',
+	'PRAGMA mmap_size=268435456',
+)
+
+
+# Pool de conexões para bancos servidor (PostgreSQL/MySQL)
+SERVER_POOL_OPTIONS = {
+	'pool_size': 10,
+	'max_overflow': 20,
+	'pool_timeout': 30,
+	'pool_recycle': 1800,  # abaixo do idle timeout típico de proxies/servidores
+	'pool_pre_ping': True,
+}
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+	import sqlite3
+	if not isinstance(dbapi_connection, sqlite3.Connection):
+		return
+	cursor = dbapi_connection.cursor()
+	try:
+		for pragma in SQLITE_PRAGMAS:
+			cursor.execute(pragma)
+	finally:
+		cursor.close()
+
+
+def _create_db():
+	"""Importa o Flask-SQLAlchemy e cria a instância compartilhada."""
+	from flask_sqlalchemy import SQLAlchemy
+	from sqlalchemy import event
+	from sqlalchemy.engine import Engine
+	event.listen(Engine, 'connect', _set_sqlite_pragmas)
+	return SQLAlchemy()
+
+
+def engine_options(database_uri: str) -> dict:
+	"""
+	Opções de ``create_engine`` conforme o banco configurado.
+
+	Inserções em lote (seed, sincronização de dispositivos) viram INSERTs
+	multi-VALUES via insertmanyvalues; no PostgreSQL/psycopg2 o executemany
+	também usa o modo em lote do driver.
+
+	Em bancos servidor, o pool mantém conexões aquecidas para rajadas de
+	webhooks (IFTTT/Alexa) sem handshake TCP+auth por requisição; o SQLite
+	local fica com o pool padrão.
+	"""
+	options = {'insertmanyvalues_page_size': 10000}
+	scheme = database_uri.split(':', 1)[0]
+	if scheme in ('postgresql', 'postgresql+psycopg2'):
+		options['executemany_mode'] = 'values_plus_batch'
+	if not scheme.startswith('sqlite'):
+		options.update(SERVER_POOL_OPTIONS)
+	return options
+
+
+def __getattr__(name):
+	# Instância do SQLAlchemy para ORM, criada no primeiro acesso a ``extensions.db``:
+	# quem só precisa do logger não carrega SQLAlchemy.
+	if name == 'db':
+		instance = globals()['db'] = _create_db()
+		return instance
+	raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 # Logger compartilhado simples
 logger = logging.getLogger('solarmind')
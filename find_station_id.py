@@ -5,17 +5,35 @@ O Station ID é diferente do Inverter ID (Serial Number).
 Ele geralmente é um UUID encontrado:
 1. Na URL do portal SEMS quando você navega para sua estação
 2. Ou pode ser obtido listando as estações da sua conta
+
+Uso:
+    python find_station_id.py [--verbose]
+
+Com --verbose o payload completo da resposta é impresso (indentado).
 """
 
-from services.goodwe_client import GoodWeClient
-import json
+import sys
+
+from services.goodwe_client import GoodWeClient, URLS
+from services.http_session import SESSION
+
+try:
+    import orjson
 
-def find_station_id():
+    def _pp(data) -> str:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2).decode('utf-8')
+except ImportError:  # orjson é opcional para este script
+    import json
+
+    def _pp(data) -> str:
+        return json.dumps(data, indent=2, ensure_ascii=False)
+
+def find_station_id(verbose: bool = False):
     print("=" * 60)
     print("BUSCANDO SEMS_STATION_ID")
     print("=" * 60)
     
-    gc = GoodWeClient()
+    gc = GoodWeClient(session=SESSION)
     
     # Fazer login
     print("\n[1] Fazendo login na GoodWe API...")
@@ -27,10 +45,7 @@ def find_station_id():
     
     # Tentar listar estações
     print("\n[2] Tentando listar Power Stations da sua conta...")
-    base = gc._get_base_url()
-    
-    # Endpoint para listar estações
-    url = f"{base}v2/PowerStation/GetPowerStationListByUserId"
+    url = URLS.get(gc.region, URLS["us"])["station_list"]
     headers = {"Token": token, "Content-Type": "application/json"}
     
     try:
@@ -42,8 +57,9 @@ def find_station_id():
             return
         
         data = response.json()
-        print("\n✅ Resposta recebida:")
-        print(json.dumps(data, indent=2))
+        print("\n✅ Resposta recebida")
+        if verbose:
+            print(_pp(data))
         
         # Tentar extrair station IDs
         if isinstance(data, dict) and data.get('code') == 0:
@@ -83,4 +99,4 @@ def find_station_id():
 
 
 if __name__ == "__main__":
-    find_station_id()
+    find_station_id(verbose='--verbose' in sys.argv[1:])
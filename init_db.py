@@ -8,10 +8,7 @@ Uso:
     python init_db.py
 """
 
-from app import create_app
 from extensions import db
-from models.aparelho import Aparelho
-from models.usuario import Usuario
 
 
 def init_database():
@@ -19,7 +16,13 @@ def init_database():
     Inicializa o banco de dados criando todas as tabelas
     e adicionando dados de exemplo para desenvolvimento.
     """
-    app = create_app()
+    # Imports tardios: importar este módulo não cria o app nem carrega os modelos
+    from app import get_app
+    from models.aparelho import Aparelho
+    from models.usuario import Usuario
+    from utils.slug import slugify
+
+    app = get_app()
     
     with app.app_context():
         # Remove todas as tabelas existentes
@@ -30,31 +33,45 @@ def init_database():
         db.create_all()
         print("✅ Tabelas criadas com sucesso!")
         
-        # Cria usuário de exemplo
-        usuario_exemplo = Usuario(
-            nome="admin",
-            email="admin@solarmind.com",
-            senha="admin123"
-        )
-        
-        db.session.add(usuario_exemplo)
-        db.session.commit()
-        print("👤 Usuário administrador criado")
-        
-        # Cria aparelhos de exemplo
-        aparelhos_exemplo = [
-            Aparelho("ventilador", 0.1, 3, usuario_exemplo.id),
-            Aparelho("ar condicionado", 2.5, 1, usuario_exemplo.id),
-            Aparelho("geladeira", 0.3, 1, usuario_exemplo.id),
-            Aparelho("tv", 0.2, 4, usuario_exemplo.id),
-            Aparelho("notebook", 0.1, 3, usuario_exemplo.id)
-        ]
+        # Seed em uma única transação (um único COMMIT ao sair do bloco)
+        with db.session.begin():
+            # Cria usuário de exemplo
+            usuario_exemplo = Usuario(
+                nome="admin",
+                email="admin@solarmind.com",
+                senha="admin123",
+                # Hash rápido: usuário de exemplo, senha já pública
+                method="pbkdf2:sha256:10000"
+            )
         
-        for aparelho in aparelhos_exemplo:
-            db.session.add(aparelho)
+            db.session.add(usuario_exemplo)
+            # flush atribui usuario_exemplo.id sem encerrar a transação
+            db.session.flush()
+            print("👤 Usuário administrador criado")
         
-        db.session.commit()
-        print(f"🏠 {len(aparelhos_exemplo)} aparelhos de exemplo criados")
+            # Cria aparelhos de exemplo (um único INSERT multi-linha, sem instâncias ORM)
+            aparelhos_exemplo = [
+                {
+                    'nome': nome,
+                    'slug': slugify(nome),
+                    'consumo': consumo,
+                    'prioridade': prioridade,
+                    'usuario_id': usuario_exemplo.id,
+                    'status': True,
+                    'codigo_externo': None,
+                    'origem': None,
+                }
+                for nome, consumo, prioridade in (
+                    ("ventilador", 0.1, 3),
+                    ("ar condicionado", 2.5, 1),
+                    ("geladeira", 0.3, 1),
+                    ("tv", 0.2, 4),
+                    ("notebook", 0.1, 3),
+                )
+            ]
+            # INSERT do Core direto na tabela: sem o processamento de bulk do ORM
+            db.session.execute(Aparelho.__table__.insert(), aparelhos_exemplo)
+            print(f"🏠 {len(aparelhos_exemplo)} aparelhos de exemplo criados")
         
         print("\n🌞 Banco de dados SolarMind inicializado com sucesso!")
         print("📊 Dashboard disponível em: http://localhost:5000")
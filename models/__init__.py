@@ -1,3 +1,4 @@
 from .usuario import Usuario
 from .aparelho import Aparelho
-from .smartplug_reading import SmartPlugReading
\ No newline at end of file
+from .smartplug_reading import SmartPlugReading
+from .sync_job import SyncJob
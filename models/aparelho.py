@@ -5,7 +5,16 @@ Define a estrutura dos aparelhos eletrônicos monitorados
 pelo sistema de automação residencial.
 """
 
+from blinker import Namespace
+
 from extensions import db
+from utils.slug import slugify
+
+_signals = Namespace()
+
+# Emitido (sender=usuario_id) após INSERT/UPDATE/DELETE em aparelhos feitos via
+# Core, que não disparam os eventos de mapper usados para invalidar caches.
+aparelhos_alterados = _signals.signal('aparelhos-alterados')
 
 
 class Aparelho(db.Model):
@@ -20,7 +29,7 @@ class Aparelho(db.Model):
 
     # Campos da tabela
     id = db.Column(db.Integer, primary_key=True)
-    nome = db.Column(db.String(100), nullable=False, index=True)
+    nome = db.Column(db.String(100), nullable=False)
     consumo = db.Column(db.Float, nullable=False)  # Consumo em kWh
     prioridade = db.Column(db.Integer, nullable=False)  # 1 (alta) a 5 (baixa)
     status = db.Column(db.Boolean, default=True, nullable=False)  # True = ligado
@@ -29,6 +38,17 @@ class Aparelho(db.Model):
     codigo_externo = db.Column(db.String(100), index=True, nullable=True)
     # Origem/Fonte do dispositivo (ex: 'tuya', 'manual', 'goodwe')
     origem = db.Column(db.String(30), index=True, nullable=True)
+    # Slug do nome (endpointId da Alexa), mantido automaticamente ao definir nome
+    slug = db.Column(db.String(120), nullable=True)
+
+    __table_args__ = (
+        # Nome único por usuário; também atende consultas por (usuario_id, nome)
+        db.Index('uq_aparelhos_user_nome', 'usuario_id', 'nome', unique=True),
+        # Busca case-insensitive por voz/IFTTT: lower(nome) = :nome
+        db.Index('ix_aparelhos_lower_nome', db.func.lower(nome), usuario_id),
+        # Alexa (Discovery/PowerController/Intent): igualdade por slug
+        db.Index('ix_aparelhos_user_slug', 'usuario_id', 'slug'),
+    )
 
     def __init__(self, nome, consumo, prioridade, usuario_id, codigo_externo=None, origem=None):
         """
@@ -48,6 +68,12 @@ class Aparelho(db.Model):
         self.codigo_externo = codigo_externo
         self.origem = origem
 
+    @db.validates('nome')
+    def _sync_slug(self, key, value):
+        """Recalcula o slug sempre que o nome muda (criação, edição, sync Tuya)."""
+        self.slug = slugify(value)
+        return value
+
     def ligar(self):
         """Liga o aparelho."""
         self.status = True
@@ -75,7 +101,8 @@ class Aparelho(db.Model):
             'status': self.status,
             'usuario_id': self.usuario_id,
             'codigo_externo': self.codigo_externo,
-            'origem': self.origem
+            'origem': self.origem,
+            'slug': self.slug
         }
 
     def __repr__(self):
@@ -4,6 +4,7 @@ Armazena snapshots periódicos do estado elétrico para análise histórica
 e correlação com a geração solar.
 """
 from datetime import datetime
+from sqlalchemy.dialects.postgresql import JSONB
 from extensions import db
 
 class SmartPlugReading(db.Model):
@@ -19,7 +20,18 @@ class SmartPlugReading(db.Model):
     current_a = db.Column(db.Float)       # Corrente (A)
     energy_wh = db.Column(db.Float)       # Energia acumulada (Wh / ou kWh*1000 dependendo do DPS)
 
-    raw_status = db.Column(db.JSON)       # Payload bruto retornado pela API Tuya (status/result)
+    # Payload bruto retornado pela API Tuya (status/result); JSONB (binário) no PostgreSQL.
+    # Carregado só quando acessado (to_dict não o usa); use undefer('raw_status') se precisar em lote.
+    raw_status = db.deferred(db.Column(db.JSON().with_variant(JSONB(), 'postgresql')))
+
+    @classmethod
+    def bulk_insert(cls, rows: list[dict]) -> int:
+        """Insere várias leituras com um único executemany e um único commit."""
+        if not rows:
+            return 0
+        db.session.execute(db.insert(cls), rows)
+        db.session.commit()
+        return len(rows)
 
     def to_dict(self):
         return {
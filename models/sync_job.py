@@ -0,0 +1,20 @@
+"""Modelo de jobs de sincronização Tuya disparados pela interface.
+
+O andamento fica no banco (e não em memória) para que qualquer worker
+gunicorn responda a /aparelhos/sync-status/<job_id>; cada job pertence ao
+usuário que o iniciou.
+"""
+from datetime import datetime
+from extensions import db
+
+class SyncJob(db.Model):
+    __tablename__ = 'sync_jobs'
+
+    id = db.Column(db.String(32), primary_key=True)  # ex: tuya-sync-1a2b3c4d
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), index=True, nullable=True)
+    status = db.Column(db.String(16), nullable=False, default='queued')  # queued|running|finished|failed
+    result = db.Column(db.JSON, nullable=True)  # estatísticas de sync_tuya_devices
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True, nullable=False)
+
+    def __repr__(self):
+        return f'<SyncJob {self.id} {self.status}>'
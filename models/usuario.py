@@ -29,7 +29,7 @@ class Usuario(UserMixin, db.Model):
     # Relacionamentos
     aparelhos = db.relationship('Aparelho', backref='usuario', lazy=True)
 
-    def __init__(self, nome, email, senha=None):
+    def __init__(self, nome, email, senha=None, method=None):
         """
         Inicializa um novo usuário.
         
@@ -37,20 +37,26 @@ class Usuario(UserMixin, db.Model):
             nome (str): Nome do usuário
             email (str): Email do usuário
             senha (str, optional): Senha em texto plano
+            method (str, optional): Método de hash (ver set_senha)
         """
         self.nome = nome
         self.email = email
         if senha:
-            self.set_senha(senha)
+            self.set_senha(senha, method=method)
 
-    def set_senha(self, senha):
+    def set_senha(self, senha, method=None):
         """
         Define a senha do usuário (com hash).
         
         Args:
             senha (str): Senha em texto plano
+            method (str, optional): Método do Werkzeug (ex: 'pbkdf2:sha256:10000').
+                Padrão do Werkzeug quando omitido; use menos iterações só em seed de dev.
         """
-        self.senha_hash = generate_password_hash(senha)
+        if method:
+            self.senha_hash = generate_password_hash(senha, method=method)
+        else:
+            self.senha_hash = generate_password_hash(senha)
 
     def checar_senha(self, senha):
         """
@@ -0,0 +1,80 @@
+"""
+Blueprints da aplicação SolarMind.
+
+Os módulos de rotas são importados sob demanda (PEP 562): ``routes.api_bp``
+só carrega ``routes.api`` no primeiro acesso ao atributo. Assim, scripts que
+importam o pacote sem registrar blueprints não pagam o custo de importar
+SQLAlchemy, clientes GoodWe/Tuya e demais dependências das rotas.
+
+Rotas sem hooks de blueprint (before_request, error handlers) e sem uso em
+``url_for`` podem ser registradas em ``LAZY_VIEWS``: a regra de URL existe desde
+o boot, mas o módulo da view só é importado na primeira requisição.
+"""
+
+import importlib
+
+from werkzeug.utils import cached_property, import_string
+
+# nome do blueprint -> módulo que o define
+_BLUEPRINTS = {
+    'api_bp': '.api',
+    'auth_bp': '.auth',
+    'dash_bp': '.dashboard',
+    'main_bp': '.main',
+    'aparelhos_bp': '.aparelhos',
+    'estatisticas_bp': '.estatisticas',
+    'alexa_bp': '.alexa',
+    'chat_bp': '.chat',
+}
+
+# Blueprints registrados no app factory (ordem = ordem de registro)
+BLUEPRINTS = (
+    'api_bp',
+    'auth_bp',
+    'dash_bp',
+    'main_bp',
+    'aparelhos_bp',
+    'estatisticas_bp',
+    'chat_bp',
+)
+
+# (regra, endpoint, view importável, métodos) registradas via LazyView
+LAZY_VIEWS = (
+    ('/alexa/ping', 'alexa.alexa_ping', 'routes.alexa.alexa_ping', ['GET']),
+    ('/alexa/reportstate', 'alexa.alexa_report_state', 'routes.alexa.alexa_report_state', ['POST']),
+    ('/alexa', 'alexa.alexa_webhook', 'routes.alexa.alexa_webhook', ['POST']),
+)
+
+
+class LazyView:
+    """View que importa a função real somente na primeira chamada."""
+
+    def __init__(self, import_name: str):
+        self.__module__, self.__name__ = import_name.rsplit('.', 1)
+        self.import_name = import_name
+
+    @cached_property
+    def view(self):
+        return import_string(self.import_name)
+
+    def __call__(self, *args, **kwargs):
+        return self.view(*args, **kwargs)
+
+
+def register_lazy_views(app) -> None:
+    """Registra as regras de ``LAZY_VIEWS`` no app sem importar as views."""
+    for rule, endpoint, import_name, methods in LAZY_VIEWS:
+        app.add_url_rule(rule, endpoint=endpoint, view_func=LazyView(import_name), methods=methods)
+
+
+def __getattr__(name):
+    module_name = _BLUEPRINTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    blueprint = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = blueprint
+    return blueprint
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_BLUEPRINTS))
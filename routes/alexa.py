@@ -1,20 +1,170 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from extensions import db
-from models.aparelho import Aparelho
-from datetime import datetime
+from models.aparelho import Aparelho, aparelhos_alterados
+from utils.slug import slugify
+from utils.timefmt import utc_now_iso
+import json
 import logging
-import re
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
 
-def _slug(text: str) -> str:
-    if not text:
-        return ''
-    t = text.lower().strip()
-    t = re.sub(r'[^a-z0-9]+', '-', t)
-    t = re.sub(r'-+', '-', t).strip('-')
-    return t or text.lower()
+# Partes fixas de cada endpoint do Discovery (compartilhadas, nunca mutadas)
+_ALEXA_CAPABILITIES = (
+    {
+        'type': 'AlexaInterface',
+        'interface': 'Alexa',
+        'version': '3'
+    },
+    {
+        'type': 'AlexaInterface',
+        'interface': 'Alexa.PowerController',
+        'version': '3',
+        'properties': {
+            'supported': [{'name': 'powerState'}],
+            'proactivelyReported': False,
+            'retrievable': True
+        }
+    },
+)
+_ALEXA_ENDPOINT_TEMPLATE = {
+    'manufacturerName': 'SolarMind',
+    'displayCategories': ('SWITCH',),
+    'capabilities': _ALEXA_CAPABILITIES,
+}
+_ALEXA_DESC_FMT = 'Dispositivo %s controlado pelo SolarMind'
+# Discover.Response com messageId e endpoints já serializados (JSON) via %s
+_DISCOVER_RESPONSE_FMT = (
+    '{"event":{"header":{"namespace":"Alexa.Discovery","name":"Discover.Response",'
+    '"messageId":%s,"payloadVersion":"3"},"payload":{"endpoints":%s}}}'
+)
+
+
+def _custom_skill_json(text: str, end_session: bool) -> bytes:
+    """Serializa (uma vez, no import) uma resposta fixa de Custom Skill."""
+    return json.dumps({
+        'version': '1.0',
+        'response': {
+            'outputSpeech': {'type': 'PlainText', 'text': text},
+            'shouldEndSession': end_session
+        }
+    }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+# Respostas de erro/fallback que nunca mudam (exceto messageId): prontas em bytes
+_INVALID_DIRECTIVE_FMT = (
+    '{"event":{"header":{"namespace":"Alexa","name":"ErrorResponse","messageId":%s,'
+    '"payloadVersion":"3"},"payload":{"type":"INVALID_DIRECTIVE","message":"Diretiva não suportada."}}}'
+)
+_LAUNCH_RESPONSE = _custom_skill_json('Bem-vindo. Diga, por exemplo: desligue o ventilador.', False)
+_NOT_UNDERSTOOD_RESPONSE = _custom_skill_json('Não entendi o pedido. Diga: desligue o nome do dispositivo.', False)
+_UNSUPPORTED_RESPONSE = _custom_skill_json('Requisição não suportada.', True)
+
+
+def _json_response(body):
+    return current_app.response_class(body, mimetype='application/json')
+
+
+# ---------------------- CACHE DO DISCOVERY (stale-while-revalidate) ---------------------- #
+_DISCOVERY_TTL = 60  # segundos
+_DISCOVERY_BATCH = 100  # linhas por fetch do cursor ao montar o Discovery
+_DISCOVERY_MAXSIZE = 1024  # usuários em cache; acima disso descarta a entrada mais antiga
+_DISCOVERY_CACHE: dict[int, tuple[float, str]] = {}  # usuario_id -> (expira_em, endpoints em JSON)
+_DISCOVERY_REFRESHING: set[int] = set()
+_DISCOVERY_LOCK = threading.Lock()
+
+
+def _build_discovery_endpoints(usuario_id: int) -> str:
+    """Monta a lista de endpoints do Discovery (já serializada em JSON) a partir dos aparelhos do usuário."""
+    template, desc_fmt, dumps = _ALEXA_ENDPOINT_TEMPLATE, _ALEXA_DESC_FMT, current_app.json.dumps
+    # Só nome/slug: linhas (Row), sem hidratar objetos ORM, lidas do cursor em lotes;
+    # cada endpoint é serializado e descartado (nem linhas nem dicts ficam em lista)
+    rows = db.session.execute(
+        db.select(Aparelho.nome, Aparelho.slug)
+        .filter_by(usuario_id=usuario_id)
+        .execution_options(yield_per=_DISCOVERY_BATCH)
+    )
+    return '[' + ','.join(
+        dumps({
+            **template,
+            'endpointId': slug or slugify(nome),
+            'friendlyName': nome,
+            'description': desc_fmt % nome,
+            'cookie': {'originalName': nome},
+        })
+        for nome, slug in rows
+    ) + ']'
+
+
+def _store_discovery(usuario_id: int, endpoints_json: str) -> None:
+    if usuario_id not in _DISCOVERY_CACHE and len(_DISCOVERY_CACHE) >= _DISCOVERY_MAXSIZE:
+        _DISCOVERY_CACHE.pop(next(iter(_DISCOVERY_CACHE)), None)
+    _DISCOVERY_CACHE[usuario_id] = (time.time() + _DISCOVERY_TTL, endpoints_json)
+
+
+def _refresh_discovery(app, usuario_id: int) -> None:
+    """Recalcula o Discovery em segundo plano (thread) e atualiza o cache."""
+    try:
+        with app.app_context():
+            endpoints_json = _build_discovery_endpoints(usuario_id)
+        _store_discovery(usuario_id, endpoints_json)
+    except Exception as e:
+        logger.warning('[Alexa][Discovery] Falha ao atualizar cache: %s', e)
+    finally:
+        with _DISCOVERY_LOCK:
+            _DISCOVERY_REFRESHING.discard(usuario_id)
+
+
+def _discovery_endpoints(usuario_id: int) -> str:
+    """
+    Endpoints do Discovery (JSON pronto) com cache por usuário.
+
+    A lista é serializada uma única vez por atualização; entrada expirada é servida imediatamente (stale) enquanto uma thread a
+    recalcula; só a primeira chamada (sem cache) consulta o banco na requisição.
+    """
+    item = _DISCOVERY_CACHE.get(usuario_id)
+    if item:
+        expires, endpoints_json = item
+        if time.time() > expires:
+            with _DISCOVERY_LOCK:
+                start_refresh = usuario_id not in _DISCOVERY_REFRESHING
+                _DISCOVERY_REFRESHING.add(usuario_id)
+            if start_refresh:
+                threading.Thread(
+                    target=_refresh_discovery,
+                    args=(current_app._get_current_object(), usuario_id),
+                    daemon=True,
+                ).start()
+        return endpoints_json
+
+    try:
+        endpoints_json = _build_discovery_endpoints(usuario_id)
+    except Exception as e:
+        logger.exception('[Alexa][Discovery] Erro ao buscar dispositivos: %s', e)
+        return '[]'
+    _store_discovery(usuario_id, endpoints_json)
+    return endpoints_json
+
+
+@db.event.listens_for(Aparelho, 'after_insert')
+@db.event.listens_for(Aparelho, 'after_delete')
+def _invalidate_discovery(mapper, connection, target):
+    _DISCOVERY_CACHE.pop(target.usuario_id, None)
+
+
+@aparelhos_alterados.connect
+def _invalidate_discovery_for_user(usuario_id, **extra):
+    _DISCOVERY_CACHE.pop(usuario_id, None)
+
+
+@db.event.listens_for(Aparelho, 'after_update')
+def _invalidate_discovery_on_rename(mapper, connection, target):
+    # Ligar/desligar não altera o Discovery; só renomear invalida
+    if db.inspect(target).attrs.nome.history.has_changes():
+        _DISCOVERY_CACHE.pop(target.usuario_id, None)
+
 
 alexa_bp = Blueprint('alexa', __name__)
 
@@ -24,7 +174,7 @@ def alexa_ping():
     """Healthcheck simples para Lambda ou monitoramentos."""
     return jsonify({
         'status': 'ok',
-        'ts': datetime.utcnow().isoformat() + 'Z'
+        'ts': utc_now_iso()
     })
 
 
@@ -41,180 +191,149 @@ def alexa_report_state():
     return jsonify({'ok': True, 'note': 'ReportState stub - não configurado para proativo'})
 
 
-@alexa_bp.route('/alexa', methods=['POST'])
-def alexa_webhook():
-    """
-    Webhook para Skills Personalizadas (Custom Skill) da Alexa.
-    Converte o intent DesligarDispositivoIntent em ação no backend.
-    Responde no formato esperado pela Alexa (response.outputSpeech).
-    """
-    body = request.get_json(silent=True) or {}
-    logger.info('[Alexa] Payload recebido=%s', str(body)[:800])
-
-    # 1) Suporte a Smart Home (payload raiz "directive")
-    if 'directive' in body:
-        d = body.get('directive', {})
-        header = d.get('header', {})
-        namespace = header.get('namespace')
-        name = header.get('name')
-        endpoint = d.get('endpoint', {})
-        endpoint_id = endpoint.get('endpointId')
-
-        # Authorization - AcceptGrant (requerido por Smart Home com Account Linking)
-        if namespace == 'Alexa.Authorization' and name == 'AcceptGrant':
-            # Para implementação futura: armazenar grantCode / grantee.token em tabela.
-            return jsonify({
-                'event': {
-                    'header': {
-                        'namespace': 'Alexa.Authorization',
-                        'name': 'AcceptGrant.Response',
-                        'messageId': header.get('messageId', 'msg-1'),
-                        'payloadVersion': '3'
-                    },
-                    'payload': {}
-                }
-            })
-
-        # Discovery - retorna a lista de dispositivos do usuário
-        if namespace == 'Alexa.Discovery' and name == 'Discover':
-            usuario_id = 1
-            endpoints = []
-            try:
-                dispositivos = Aparelho.query.filter_by(usuario_id=usuario_id).all()
-            except Exception as e:
-                logger.exception('[Alexa][Discovery] Erro ao buscar dispositivos: %s', e)
-                dispositivos = []
-
-            for ap in dispositivos:
-                friendly = ap.nome
-                endpoint_id = _slug(friendly)
-                endpoint_obj = {
-                    'endpointId': endpoint_id,
-                    'manufacturerName': 'SolarMind',
-                    'friendlyName': friendly,
-                    'description': f'Dispositivo {friendly} controlado pelo SolarMind',
-                    'displayCategories': ['SWITCH'],
-                    'cookie': {'originalName': friendly},
-                    'capabilities': [
-                        {
-                            'type': 'AlexaInterface',
-                            'interface': 'Alexa',
-                            'version': '3'
-                        },
-                        {
-                            'type': 'AlexaInterface',
-                            'interface': 'Alexa.PowerController',
-                            'version': '3',
-                            'properties': {
-                                'supported': [{'name': 'powerState'}],
-                                'proactivelyReported': False,
-                                'retrievable': True
-                            }
-                        }
-                    ]
-                }
-                endpoints.append(endpoint_obj)
-
-            return jsonify({
-                'event': {
-                    'header': {
-                        'namespace': 'Alexa.Discovery',
-                        'name': 'Discover.Response',
-                        'messageId': header.get('messageId', 'msg-1'),
-                        'payloadVersion': '3'
-                    },
-                    'payload': { 'endpoints': endpoints }
-                }
-            })
+# ---------------------- DIRETIVAS SMART HOME ---------------------- #
+def _handle_accept_grant(header, endpoint, body):
+    """Authorization - AcceptGrant (requerido por Smart Home com Account Linking)."""
+    # Para implementação futura: armazenar grantCode / grantee.token em tabela.
+    return jsonify({
+        'event': {
+            'header': {
+                'namespace': 'Alexa.Authorization',
+                'name': 'AcceptGrant.Response',
+                'messageId': header.get('messageId', 'msg-1'),
+                'payloadVersion': '3'
+            },
+            'payload': {}
+        }
+    })
 
-        # Apenas PowerController básico
-        if namespace == 'Alexa.PowerController' and endpoint_id:
-            usuario_id = 1
-            normalized = endpoint_id.lower()
-            ap = (Aparelho.query
-                  .filter(Aparelho.usuario_id == usuario_id)
-                  .filter((Aparelho.nome.ilike(normalized)) | (Aparelho.nome.ilike(endpoint_id)))
-                  .first())
-            if not ap:
-                # Resposta de erro mínima
-                return jsonify({
-                    'event': {
-                        'header': {
-                            'namespace': 'Alexa',
-                            'name': 'ErrorResponse',
-                            'messageId': header.get('messageId', 'msg-1'),
-                            'correlationToken': header.get('correlationToken'),
-                            'payloadVersion': '3'
-                        },
-                        'endpoint': {'endpointId': endpoint_id},
-                        'payload': {
-                            'type': 'NO_SUCH_ENDPOINT',
-                            'message': f"Dispositivo '{endpoint_id}' não encontrado."
-                        }
-                    }
-                })
 
-            # Aplica comando
-            if name == 'TurnOff':
-                ap.status = False
-                state_val = 'OFF'
-            elif name == 'TurnOn':
-                ap.status = True
-                state_val = 'ON'
-            else:
-                state_val = 'UNKNOWN'
-            db.session.commit()
+def _handle_discovery(header, endpoint, body):
+    """Discovery - retorna a lista de dispositivos do usuário."""
+    usuario_id = 1
+    endpoints_json = _discovery_endpoints(usuario_id)
+    # Só o messageId muda entre chamadas: a lista vem serializada do cache
+    message_id = current_app.json.dumps(header.get('messageId', 'msg-1'))
+    return _json_response(_DISCOVER_RESPONSE_FMT % (message_id, endpoints_json))
 
-            logger.info('[Alexa][PowerController] endpoint=%s action=%s state=%s', endpoint_id, name, state_val)
 
-            return jsonify({
-                'context': {
-                    'properties': [{
-                        'namespace': 'Alexa.PowerController',
-                        'name': 'powerState',
-                        'value': state_val,
-                        'timeOfSample': datetime.utcnow().isoformat() + 'Z',
-                        'uncertaintyInMilliseconds': 50
-                    }]
-                },
-                'event': {
-                    'header': {
-                        'namespace': 'Alexa',
-                        'name': 'Response',
-                        'messageId': header.get('messageId', 'msg-1') + '-r',
-                        'correlationToken': header.get('correlationToken'),
-                        'payloadVersion': '3'
-                    },
-                    'endpoint': {'endpointId': endpoint_id},
-                    'payload': {}
-                }
-            })
+def _handle_power(header, endpoint, body):
+    """PowerController - TurnOn/TurnOff do aparelho anunciado como ``endpointId``."""
+    endpoint_id = endpoint.get('endpointId')
+    if not endpoint_id:
+        return _invalid_directive(header)
 
-        # Diretiva não suportada
+    name = header.get('name')
+    message_id = header.get('messageId', 'msg-1')
+    correlation_token = header.get('correlationToken')
+    usuario_id = 1
+    # endpointId é o slug anunciado no Discovery: igualdade indexada em (usuario_id, slug).
+    # Slugs não são únicos ('tv' e 'TV' geram o mesmo), então o UPDATE fica
+    # restrito a um único aparelho, como o .first() de antes.
+    alvo = (
+        db.select(Aparelho.id)
+        .where(Aparelho.usuario_id == usuario_id, Aparelho.slug == slugify(endpoint_id))
+        .order_by(Aparelho.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    # Busca + comando em um único UPDATE ... RETURNING
+    row = db.session.execute(
+        db.update(Aparelho)
+        .where(Aparelho.id == alvo)
+        .values(status=(name == 'TurnOn'))
+        .returning(Aparelho.status)
+    ).first()
+    db.session.commit()
+    if row is None:
+        # Resposta de erro mínima
         return jsonify({
             'event': {
                 'header': {
                     'namespace': 'Alexa',
                     'name': 'ErrorResponse',
-                    'messageId': header.get('messageId', 'msg-1'),
+                    'messageId': message_id,
+                    'correlationToken': correlation_token,
                     'payloadVersion': '3'
                 },
-                'payload': {'type': 'INVALID_DIRECTIVE', 'message': 'Diretiva não suportada.'}
+                'endpoint': {'endpointId': endpoint_id},
+                'payload': {
+                    'type': 'NO_SUCH_ENDPOINT',
+                    'message': f"Dispositivo '{endpoint_id}' não encontrado."
+                }
             }
         })
 
+    state_val = 'ON' if row.status else 'OFF'
+    logger.info('[Alexa][PowerController] endpoint=%s action=%s state=%s', endpoint_id, name, state_val)
+    time_of_sample = utc_now_iso()
+
+    return jsonify({
+        'context': {
+            'properties': [{
+                'namespace': 'Alexa.PowerController',
+                'name': 'powerState',
+                'value': state_val,
+                'timeOfSample': time_of_sample,
+                'uncertaintyInMilliseconds': 50
+            }]
+        },
+        'event': {
+            'header': {
+                'namespace': 'Alexa',
+                'name': 'Response',
+                'messageId': message_id + '-r',
+                'correlationToken': correlation_token,
+                'payloadVersion': '3'
+            },
+            'endpoint': {'endpointId': endpoint_id},
+            'payload': {}
+        }
+    })
+
+
+def _invalid_directive(header):
+    """Diretiva não suportada."""
+    message_id = current_app.json.dumps(header.get('messageId', 'msg-1'))
+    return _json_response(_INVALID_DIRECTIVE_FMT % message_id)
+
+
+# (namespace, name) -> handler(header, endpoint, body)
+_SMARTHOME_HANDLERS = {
+    ('Alexa.Authorization', 'AcceptGrant'): _handle_accept_grant,
+    ('Alexa.Discovery', 'Discover'): _handle_discovery,
+    ('Alexa.PowerController', 'TurnOn'): _handle_power,
+    ('Alexa.PowerController', 'TurnOff'): _handle_power,
+}
+
+
+@alexa_bp.route('/alexa', methods=['POST'])
+def alexa_webhook():
+    """
+    Webhook para Skills Personalizadas (Custom Skill) da Alexa.
+    Converte o intent DesligarDispositivoIntent em ação no backend.
+    Responde no formato esperado pela Alexa (response.outputSpeech).
+    """
+    body = request.get_json(silent=True) or {}
+    # str(body) só é montado se INFO estiver habilitado
+    if logger.isEnabledFor(logging.INFO):
+        logger.info('[Alexa] Payload recebido=%s', str(body)[:800])
+
+    # 1) Suporte a Smart Home (payload raiz "directive")
+    if 'directive' in body:
+        d = body.get('directive', {})
+        header = d.get('header', {})
+        handler = _SMARTHOME_HANDLERS.get((header.get('namespace'), header.get('name')))
+        if handler is None:
+            return _invalid_directive(header)
+        return handler(header, d.get('endpoint', {}), body)
+
     # 2) Estrutura padrão de Custom Skill
     req = body.get('request') or {}
     req_type = req.get('type')
 
     if req_type == 'LaunchRequest':
-        return jsonify({
-            'version': '1.0',
-            'response': {
-                'outputSpeech': {'type': 'PlainText', 'text': 'Bem-vindo. Diga, por exemplo: desligue o ventilador.'},
-                'shouldEndSession': False
-            }
-        })
+        return _json_response(_LAUNCH_RESPONSE)
 
     if req_type == 'IntentRequest':
         intent = req.get('intent', {})
@@ -230,11 +349,7 @@ def alexa_webhook():
         if intent_name == 'DesligarDispositivoIntent' and dispositivo:
             # Simula usuário logado em desenvolvimento; ajuste para sua auth real
             usuario_id = 1
-            device_slug = _slug(dispositivo)
-            ap = (Aparelho.query
-                  .filter(Aparelho.usuario_id == usuario_id)
-                  .filter((Aparelho.nome.ilike(dispositivo)) | (Aparelho.nome.ilike(device_slug)))
-                  .first())
+            ap = Aparelho.query.filter_by(usuario_id=usuario_id, slug=slugify(dispositivo)).first()
             if not ap:
                 msg = f"Não encontrei um dispositivo chamado {dispositivo}."
                 logger.warning('[Alexa][Intent] dispositivo_nao_encontrado=%s', dispositivo)
@@ -264,19 +379,7 @@ def alexa_webhook():
             })
 
         # Intent desconhecida ou sem slot
-        return jsonify({
-            'version': '1.0',
-            'response': {
-                'outputSpeech': {'type': 'PlainText', 'text': 'Não entendi o pedido. Diga: desligue o nome do dispositivo.'},
-                'shouldEndSession': False
-            }
-        })
+        return _json_response(_NOT_UNDERSTOOD_RESPONSE)
 
     # Tipos não suportados
-    return jsonify({
-        'version': '1.0',
-        'response': {
-            'outputSpeech': {'type': 'PlainText', 'text': 'Requisição não suportada.'},
-            'shouldEndSession': True
-        }
-    })
+    return _json_response(_UNSUPPORTED_RESPONSE)
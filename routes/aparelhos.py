@@ -5,22 +5,248 @@ This module provides web routes for managing smart home devices,
 including adding, editing, removing, and controlling device states.
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, session, jsonify, flash
+from flask import Blueprint, current_app, g, render_template, request, redirect, url_for, session, jsonify, flash
+from flask_login import current_user
+import hashlib
 import os
-from datetime import datetime
+import threading
+import time
 
-from models.aparelho import Aparelho
-from services.device_sync import sync_tuya_devices
-from services.tuya_client import TuyaClient
+from sqlalchemy.exc import IntegrityError
+
+from models.aparelho import Aparelho, aparelhos_alterados
+from services.scheduler import enqueue_device_sync, get_sync_job
+from services.status_writer import enqueue_status
+from services.tuya_client import get_shared_client
+from env_cache import load_env_once
 from extensions import db
 from routes.auth import login_required
 from utils.logger import get_logger
+from utils.slug import slugify
+from utils.timefmt import utc_now_iso
 
 logger = get_logger(__name__)
 
+# Lido uma vez no import (o .env não muda com o processo rodando)
+load_env_once()
+_TUYA_DEVICE_ID = os.getenv('TUYA_DEVICE_ID')
+
 aparelhos_bp = Blueprint('aparelhos', __name__)
 
 
+@aparelhos_bp.before_request
+def _load_user_id():
+    """Resolve o usuário da sessão uma vez por requisição em ``g.user_id``."""
+    # Anônimos seguem para o login_required de cada rota (redirect para o login)
+    if current_user.is_authenticated:
+        _ensure_authenticated()
+        g.user_id = session['usuario_id']
+
+# Cache curto das métricas Tuya por codigo_externo: o dashboard consulta
+# /aparelhos/consumo-atual a cada poucos segundos e a leitura muda devagar
+_TUYA_METRICS_TTL = 8  # segundos
+_TUYA_METRICS_MAXSIZE = 1024
+_TUYA_METRICS_CACHE: dict[str, tuple[float, dict]] = {}  # codigo_externo -> (expira_em, metrics)
+_TUYA_METRICS_LOCK = threading.Lock()
+
+
+def _tuya_metrics_many(codigos) -> dict:
+    """Métricas Tuya (power_w, switch_on, ...) por codigo_externo, reaproveitadas por alguns segundos.
+
+    Só os devices fora do cache vão à Tuya, todos em uma única chamada em lote.
+    """
+    now = time.time()
+    result, missing = {}, []
+    for codigo in codigos:
+        item = _TUYA_METRICS_CACHE.get(codigo)
+        if item and item[0] > now:
+            result[codigo] = item[1]
+        else:
+            missing.append(codigo)
+    if not missing:
+        return result
+
+    client = get_shared_client()
+    statuses = client.get_device_statuses(missing)
+    with _TUYA_METRICS_LOCK:
+        for codigo, status_resp in statuses.items():
+            # Usar o parser centralizado do TuyaClient
+            metrics = client.parse_metrics(status_resp)
+            result[codigo] = metrics
+            # Erros não entram no cache: a próxima consulta tenta de novo
+            if 'error' not in status_resp:
+                if len(_TUYA_METRICS_CACHE) >= _TUYA_METRICS_MAXSIZE:
+                    _TUYA_METRICS_CACHE.clear()
+                _TUYA_METRICS_CACHE[codigo] = (now + _TUYA_METRICS_TTL, metrics)
+    return result
+
+
+def _tuya_metrics(codigo_externo):
+    """Métricas Tuya de um único device (ver ``_tuya_metrics_many``)."""
+    return _tuya_metrics_many((codigo_externo,))[codigo_externo]
+
+
+def _consumo_payload(ap, metrics) -> dict:
+    """Potência/status do aparelho: leitura Tuya quando disponível, senão estimativa."""
+    if metrics is not None:
+        potencia_w = metrics.get('power_w')
+        switch_on = metrics.get('switch_on')
+
+        # Atualiza o status no banco de dados local para manter a consistência
+        # (gravação em lote pelo status_writer, sem commit por poll)
+        if switch_on is not None and ap.status != switch_on:
+            enqueue_status(current_app._get_current_object(), ap.id, switch_on)
+
+        if potencia_w is not None:
+            return {
+                'potencia': round(potencia_w, 2),
+                'status': switch_on,
+                'fonte': 'tuya',
+                'timestamp': utc_now_iso()
+            }
+
+    # Estimativa: consumo_kwh_dia -> potência média assumindo 4h ativo
+    potencia_estimada = round(ap.consumo * 1000 / 4, 2)
+    return {
+        'potencia': potencia_estimada,
+        'fonte': 'estimado',
+        'status': ap.status, # Retorna o status do banco de dados
+        'timestamp': utc_now_iso()
+    }
+
+
+def _conditional_json(payload, chave):
+    """JSON com ETag derivado de ``chave``; responde 304 se o cliente já tem essa versão.
+
+    ``chave`` deve conter só o que muda de fato (sem o timestamp do payload),
+    para que polls sem alteração não serializem o corpo de novo.
+    """
+    etag = hashlib.blake2b(repr(chave).encode(), digest_size=8).hexdigest()
+    if request.if_none_match.contains(etag):
+        resp = current_app.response_class(status=304)
+    else:
+        resp = jsonify(payload)
+    resp.set_etag(etag)
+    # Força revalidação a cada poll em vez de servir do cache do navegador
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
+
+
+def _consumo_chave(payload):
+    """Campos de ``_consumo_payload`` que definem a versão (ETag) da leitura."""
+    return payload['potencia'], payload['status'], payload['fonte']
+
+
+def _get_owned(aparelho_id, usuario_id):
+    """Aparelho pela chave primária (identity map primeiro), se pertencer ao usuário."""
+    try:
+        aparelho = db.session.get(Aparelho, int(aparelho_id))
+    except (TypeError, ValueError):
+        return None
+    if aparelho is None or aparelho.usuario_id != usuario_id:
+        return None
+    return aparelho
+
+
+def _compute_resumo(aparelhos) -> tuple[dict, dict]:
+    """Dados do gráfico e resumo energético a partir das linhas de ``listar``."""
+    aparelhos_data = {
+        "labels": [],
+        "data": []
+    }
+    resumo_energetico = {
+        "maior_consumidor": None,
+        "mais_eficiente": None,
+        "total_consumo_kwh": 0,
+        "custo_total_reais": 0,
+        "economia_possivel": 0
+    }
+
+    if aparelhos:
+        # Uma única passada: rótulos/dados do gráfico, soma, maior e menor consumo.
+        # Em empate vale o primeiro maior e o último menor da listagem.
+        labels, data = aparelhos_data["labels"], aparelhos_data["data"]
+        total_consumo_kwh = 0.0
+        maior = menor = aparelhos[0]
+        for ap in aparelhos:
+            consumo = ap.consumo
+            labels.append(ap.nome)
+            data.append(consumo)
+            total_consumo_kwh += consumo
+            if consumo > maior.consumo:
+                maior = ap
+            if consumo <= menor.consumo:
+                menor = ap
+        resumo_energetico["maior_consumidor"] = maior
+        resumo_energetico["mais_eficiente"] = menor
+        
+        custo_total_reais = total_consumo_kwh * 0.75 # Fator de custo fixo
+        
+        resumo_energetico["total_consumo_kwh"] = total_consumo_kwh
+        resumo_energetico["custo_total_reais"] = custo_total_reais
+        resumo_energetico["economia_possivel"] = custo_total_reais * 0.15 # Estimativa de 15%
+
+    return aparelhos_data, resumo_energetico
+
+
+_UQ_NOME = 'uq_aparelhos_user_nome'
+
+
+def _nome_duplicado(exc: IntegrityError) -> bool:
+    """True se a violação for do índice único (usuario_id, nome); demais falhas não viram 409."""
+    diag = getattr(exc.orig, 'diag', None)  # psycopg2 informa o nome da constraint
+    if diag is not None and getattr(diag, 'constraint_name', None):
+        return diag.constraint_name == _UQ_NOME
+    msg = str(exc.orig)
+    # SQLite cita só as colunas: "UNIQUE constraint failed: aparelhos.usuario_id, aparelhos.nome"
+    return _UQ_NOME in msg or 'aparelhos.usuario_id, aparelhos.nome' in msg
+
+
+# Regras dos campos numéricos do formulário/JSON de aparelho, avaliadas em
+# uma única passada por _validar_aparelho:
+# (campo, conversor, faixa válida?, erro de tipo, erro de faixa)
+_REGRAS_APARELHO = (
+    ('consumo', float, lambda v: v >= 0,
+     "Consumo deve ser um número.", "Consumo não pode ser negativo."),
+    ('prioridade', int, lambda v: 1 <= v <= 5,
+     "Prioridade deve ser um inteiro.", "Prioridade deve estar entre 1 e 5."),
+)
+
+
+def _validar_aparelho(data) -> tuple[dict, str | None]:
+    """
+    Converte e valida nome, consumo e prioridade presentes em ``data``.
+
+    Campos ausentes ou vazios são ignorados (edição parcial).
+
+    Returns:
+        tuple: (valores convertidos, mensagem de erro ou None)
+    """
+    valores = {}
+    nome = data.get('nome')
+    if nome:
+        valores['nome'] = nome
+    for campo, conversor, valido, erro_tipo, erro_faixa in _REGRAS_APARELHO:
+        bruto = data.get(campo)
+        if bruto is None or bruto == '':
+            continue
+        try:
+            valor = conversor(bruto)
+        except (ValueError, TypeError):
+            return valores, erro_tipo
+        if not valido(valor):
+            return valores, erro_faixa
+        valores[campo] = valor
+    return valores, None
+
+
+def _parse_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
 @aparelhos_bp.route('/aparelhos')
 @login_required
 def listar():
@@ -30,56 +256,35 @@ def listar():
     Returns:
         str: Rendered template with device list
     """
-    if 'usuario_id' not in session:
-        # Usa helper para auto autenticar em dev
-        _ensure_authenticated()
+    uid = g.user_id
 
     try:
-        aparelhos = (Aparelho.query
-                    .filter_by(usuario_id=session['usuario_id'])
-                    .order_by(Aparelho.prioridade)
-                    .all())
-
-        # --- START: Cálculos para o resumo energético e gráfico ---
-        aparelhos_data = {
-            "labels": [],
-            "data": []
-        }
-        resumo_energetico = {
-            "maior_consumidor": None,
-            "mais_eficiente": None,
-            "total_consumo_kwh": 0,
-            "custo_total_reais": 0,
-            "economia_possivel": 0
-        }
-
-        if aparelhos:
-            aparelhos_data["labels"] = [ap.nome for ap in aparelhos]
-            aparelhos_data["data"] = [ap.consumo for ap in aparelhos]
-
-            # Ordena por consumo para facilitar a busca de min/max
-            aparelhos_por_consumo = sorted(aparelhos, key=lambda x: x.consumo, reverse=True)
-            
-            resumo_energetico["maior_consumidor"] = aparelhos_por_consumo[0]
-            resumo_energetico["mais_eficiente"] = aparelhos_por_consumo[-1]
-            
-            total_consumo_kwh = sum(ap.consumo for ap in aparelhos)
-            custo_total_reais = total_consumo_kwh * 0.75 # Fator de custo fixo
-            
-            resumo_energetico["total_consumo_kwh"] = total_consumo_kwh
-            resumo_energetico["custo_total_reais"] = custo_total_reais
-            resumo_energetico["economia_possivel"] = custo_total_reais * 0.15 # Estimativa de 15%
-
-        # --- END: Cálculos ---
-
-        logger.info(f"Retrieved {len(aparelhos)} devices for user {session['usuario_id']}")
+        # Linhas (Row) só com as colunas usadas pelo template, sem hidratar objetos ORM
+        aparelhos = db.session.execute(
+            db.select(
+                Aparelho.id,
+                Aparelho.nome,
+                Aparelho.consumo,
+                Aparelho.prioridade,
+                Aparelho.status,
+                Aparelho.origem,
+                Aparelho.codigo_externo,
+            )
+            .filter_by(usuario_id=uid)
+            .order_by(Aparelho.prioridade)
+        ).all()
+
+        # Resumo energético e gráfico (uma passada pelas linhas)
+        aparelhos_data, resumo_energetico = _compute_resumo(aparelhos)
+
+        logger.info(f"Retrieved {len(aparelhos)} devices for user {uid}")
         
         return render_template(
             'aparelhos.html', 
             aparelhos=aparelhos, 
             aparelhos_data=aparelhos_data,
             resumo_energetico=resumo_energetico, # Passa o resumo para o template
-            tuya_device_id=os.getenv('TUYA_DEVICE_ID')
+            tuya_device_id=_TUYA_DEVICE_ID
         )
         
     except Exception as e:
@@ -96,8 +301,7 @@ def adicionar():
     Returns:
         tuple: JSON response with success/error message and status code
     """
-    if not _ensure_authenticated():
-        return {"error": "Usuário não autenticado."}, 401
+    uid = g.user_id
 
     try:
         # Aceita tanto JSON quanto form data
@@ -109,46 +313,40 @@ def adicionar():
         if not data:
             return {"error": "Dados não fornecidos."}, 400
 
-        nome = data.get('nome')
-        consumo = data.get('consumo')
-        prioridade = data.get('prioridade', 3)
+        valores, erro = _validar_aparelho(data)
+        if erro:
+            return {"error": erro}, 400
 
-        if not nome or consumo is None:
+        if 'nome' not in valores or 'consumo' not in valores:
             return {"error": "Nome e consumo são obrigatórios."}, 400
 
-        try:
-            consumo = float(consumo)
-            prioridade = int(prioridade)
-        except (ValueError, TypeError):
-            return {"error": "Consumo deve ser um número e prioridade um inteiro."}, 400
-
-        if consumo < 0:
-            return {"error": "Consumo não pode ser negativo."}, 400
+        nome = valores['nome']
+        consumo = valores['consumo']
+        prioridade = valores.get('prioridade', 3)
 
-        if not (1 <= prioridade <= 5):
-            return {"error": "Prioridade deve estar entre 1 e 5."}, 400
-
-        # Check if device name already exists for user
-        existing = Aparelho.query.filter_by(
-            nome=nome, 
-            usuario_id=session['usuario_id']
-        ).first()
-        
-        if existing:
+        # INSERT direto (Core), sem unit of work; nome duplicado para o usuário
+        # é barrado pelo índice único (usuario_id, nome)
+        try:
+            db.session.execute(
+                db.insert(Aparelho).values(
+                    nome=nome,
+                    slug=slugify(nome),
+                    consumo=consumo,
+                    prioridade=prioridade,
+                    status=True,
+                    usuario_id=uid,
+                    origem='manual'
+                )
+            )
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            if not _nome_duplicado(e):
+                raise
             return {"error": f"Aparelho '{nome}' já existe."}, 409
+        aparelhos_alterados.send(uid)
 
-        aparelho = Aparelho(
-            nome=nome,
-            consumo=consumo,
-            prioridade=prioridade,
-            usuario_id=session['usuario_id'],
-            origem='manual'
-        )
-        
-        db.session.add(aparelho)
-        db.session.commit()
-
-        logger.info(f"Device '{nome}' added for user {session['usuario_id']}")
+        logger.info(f"Device '{nome}' added for user {uid}")
         
         # Se for form data, redireciona de volta para a página
         # Fixed redirect endpoint name
@@ -165,18 +363,33 @@ def adicionar():
         return {"error": "Erro interno do servidor."}, 500
 
 
-@aparelhos_bp.route('/aparelhos/desligar', methods=['POST'])
-@login_required
-def desligar_aparelho():
+def _set_status_by_name(usuario_id, nome, ligado: bool) -> str:
     """
-    Turn off a specific device.
-    
+    Liga/desliga um aparelho pelo nome com um único UPDATE condicional.
+
     Returns:
-        tuple: JSON response with success/error message and status code
+        str: 'alterado', 'inalterado' (já estava no estado pedido) ou 'nao_encontrado'
     """
-    if not _ensure_authenticated():
-        return {"error": "Usuário não autenticado."}, 401
-
+    filtro = (Aparelho.usuario_id == usuario_id, Aparelho.nome == nome)
+    result = db.session.execute(
+        db.update(Aparelho)
+        .where(*filtro, Aparelho.status != ligado)
+        .values(status=ligado)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    if result.rowcount:
+        return 'alterado'
+    # Nada atualizado: distingue "já estava assim" de "não existe"
+    existe = db.session.execute(db.select(db.exists().where(*filtro))).scalar()
+    return 'inalterado' if existe else 'nao_encontrado'
+
+
+def _toggle_response(ligado: bool):
+    """Corpo comum de /aparelhos/ligar e /aparelhos/desligar."""
+    uid = g.user_id
+
+    acao = 'ligado' if ligado else 'desligado'
     try:
         data = request.get_json()
         if not data:
@@ -186,29 +399,35 @@ def desligar_aparelho():
         if not nome_aparelho:
             return {"error": "Nome do aparelho não fornecido."}, 400
 
-        aparelho = Aparelho.query.filter_by(
-            nome=nome_aparelho, 
-            usuario_id=session['usuario_id']
-        ).first()
-        
-        if not aparelho:
-            return {"error": f"Aparelho '{nome_aparelho}' não encontrado."}, 404
+        resultado = _set_status_by_name(uid, nome_aparelho, ligado)
 
-        if not aparelho.status:
-            return {"message": f"Aparelho '{nome_aparelho}' já está desligado."}, 200
+        if resultado == 'nao_encontrado':
+            return {"error": f"Aparelho '{nome_aparelho}' não encontrado."}, 404
 
-        aparelho.status = False
-        db.session.commit()
+        if resultado == 'inalterado':
+            return {"message": f"Aparelho '{nome_aparelho}' já está {acao}."}, 200
 
-        logger.info(f"Device '{nome_aparelho}' turned off by user {session['usuario_id']}")
-        return {"message": f"Aparelho '{nome_aparelho}' desligado com sucesso."}, 200
+        logger.info(f"Device '{nome_aparelho}' turned {'on' if ligado else 'off'} by user {uid}")
+        return {"message": f"Aparelho '{nome_aparelho}' {acao} com sucesso."}, 200
 
     except Exception as e:
-        logger.error(f"Error turning off device: {e}")
+        logger.error(f"Error turning {'on' if ligado else 'off'} device: {e}")
         db.session.rollback()
         return {"error": "Erro interno do servidor."}, 500
 
 
+@aparelhos_bp.route('/aparelhos/desligar', methods=['POST'])
+@login_required
+def desligar_aparelho():
+    """
+    Turn off a specific device.
+    
+    Returns:
+        tuple: JSON response with success/error message and status code
+    """
+    return _toggle_response(False)
+
+
 @aparelhos_bp.route('/aparelhos/ligar', methods=['POST'])
 @login_required
 def ligar_aparelho():
@@ -218,39 +437,7 @@ def ligar_aparelho():
     Returns:
         tuple: JSON response with success/error message and status code
     """
-    if not _ensure_authenticated():
-        return {"error": "Usuário não autenticado."}, 401
-
-    try:
-        data = request.get_json()
-        if not data:
-            return {"error": "Dados não fornecidos."}, 400
-
-        nome_aparelho = data.get('nome')
-        if not nome_aparelho:
-            return {"error": "Nome do aparelho não fornecido."}, 400
-
-        aparelho = Aparelho.query.filter_by(
-            nome=nome_aparelho, 
-            usuario_id=session['usuario_id']
-        ).first()
-        
-        if not aparelho:
-            return {"error": f"Aparelho '{nome_aparelho}' não encontrado."}, 404
-
-        if aparelho.status:
-            return {"message": f"Aparelho '{nome_aparelho}' já está ligado."}, 200
-
-        aparelho.status = True
-        db.session.commit()
-
-        logger.info(f"Device '{nome_aparelho}' turned on by user {session['usuario_id']}")
-        return {"message": f"Aparelho '{nome_aparelho}' ligado com sucesso."}, 200
-
-    except Exception as e:
-        logger.error(f"Error turning on device: {e}")
-        db.session.rollback()
-        return {"error": "Erro interno do servidor."}, 500
+    return _toggle_response(True)
 
 
 @aparelhos_bp.route('/aparelhos/editar', methods=['POST'])
@@ -262,8 +449,7 @@ def editar_aparelho():
     Returns:
         Union: Redirect to device list or JSON error response
     """
-    if not _ensure_authenticated():
-        return {"error": "Usuário não autenticado."}, 401
+    uid = g.user_id
 
     try:
         data = request.form
@@ -272,51 +458,42 @@ def editar_aparelho():
         if not aparelho_id:
             return {"error": "ID do aparelho não fornecido."}, 400
 
-        aparelho = Aparelho.query.filter_by(
-            id=aparelho_id, 
-            usuario_id=session['usuario_id']
-        ).first()
-
-        if not aparelho:
+        aparelho_id = _parse_id(aparelho_id)
+        if aparelho_id is None:
             return {"error": "Aparelho não encontrado."}, 404
 
-        novo_nome = data.get('nome')
-        novo_consumo = data.get('consumo')
-        nova_prioridade = data.get('prioridade')
+        # Campos alterados, gravados em um único UPDATE
+        valores, erro = _validar_aparelho(data)
+        if erro:
+            return {"error": erro}, 400
 
+        novo_nome = valores.get('nome')
         if novo_nome:
-            # Check for duplicate names (excluding current device)
-            existing = Aparelho.query.filter(
-                Aparelho.nome == novo_nome,
-                Aparelho.usuario_id == session['usuario_id'],
-                Aparelho.id != aparelho_id
-            ).first()
-            
-            if existing:
-                return {"error": f"Aparelho '{novo_nome}' já existe."}, 409
-                
-            aparelho.nome = novo_nome
+            # Nome repetido é barrado no commit pelo índice único (usuario_id, nome)
+            valores['slug'] = slugify(novo_nome)
 
-        if novo_consumo:
-            try:
-                consumo = float(novo_consumo)
-                if consumo < 0:
-                    return {"error": "Consumo não pode ser negativo."}, 400
-                aparelho.consumo = consumo
-            except (ValueError, TypeError):
-                return {"error": "Consumo deve ser um número."}, 400
-
-        if nova_prioridade:
-            try:
-                prioridade = int(nova_prioridade)
-                if not (1 <= prioridade <= 5):
-                    return {"error": "Prioridade deve estar entre 1 e 5."}, 400
-                aparelho.prioridade = prioridade
-            except (ValueError, TypeError):
-                return {"error": "Prioridade deve ser um inteiro."}, 400
+        if not valores:
+            if not _get_owned(aparelho_id, uid):
+                return {"error": "Aparelho não encontrado."}, 404
+            return redirect(url_for('aparelhos.listar'))
 
-        db.session.commit()
-        logger.info(f"Device {aparelho_id} edited by user {session['usuario_id']}")
+        try:
+            result = db.session.execute(
+                db.update(Aparelho)
+                .where(Aparelho.id == aparelho_id, Aparelho.usuario_id == uid)
+                .values(**valores)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            if not _nome_duplicado(e):
+                raise
+            return {"error": f"Aparelho '{novo_nome}' já existe."}, 409
+        if not result.rowcount:
+            return {"error": "Aparelho não encontrado."}, 404
+        aparelhos_alterados.send(uid)
+        logger.info(f"Device {aparelho_id} edited by user {uid}")
         
         return redirect(url_for('aparelhos.listar'))
 
@@ -335,8 +512,7 @@ def remover_aparelho():
     Returns:
         Union: Redirect to device list or JSON error response
     """
-    if not _ensure_authenticated():
-        return {"error": "Usuário não autenticado."}, 401
+    uid = g.user_id
 
     try:
         data = request.form
@@ -345,19 +521,22 @@ def remover_aparelho():
         if not aparelho_id:
             return {"error": "ID do aparelho não fornecido."}, 400
 
-        aparelho = Aparelho.query.filter_by(
-            id=aparelho_id, 
-            usuario_id=session['usuario_id']
+        # DELETE direto (Core) devolvendo o nome para o log
+        row = db.session.execute(
+            db.delete(Aparelho)
+            .where(Aparelho.id == _parse_id(aparelho_id), Aparelho.usuario_id == uid)
+            .returning(Aparelho.nome)
+            .execution_options(synchronize_session=False)
         ).first()
+        db.session.commit()
 
-        if not aparelho:
+        if row is None:
             return {"error": "Aparelho não encontrado."}, 404
 
-        nome_aparelho = aparelho.nome
-        db.session.delete(aparelho)
-        db.session.commit()
+        nome_aparelho = row.nome
+        aparelhos_alterados.send(uid)
 
-        logger.info(f"Device '{nome_aparelho}' removed by user {session['usuario_id']}")
+        logger.info(f"Device '{nome_aparelho}' removed by user {uid}")
         return redirect(url_for('aparelhos.listar'))
 
     except Exception as e:
@@ -373,69 +552,89 @@ def sincronizar_tuya():
     try:
         # Aceita device_id explícito (form ou query) para forçar sync de único device
         device_id_forced = request.form.get('device_id') or request.args.get('device_id')
-        stats = sync_tuya_devices(usuario_id=session.get('usuario_id'), force_device_id=device_id_forced)
-        if 'error' in stats:
-            flash(f"Falha na sincronização: {stats['error']}", 'danger')
-        else:
-            extra = ''
-            if stats.get('force') or device_id_forced:
-                extra = ' (modo device único)'
-            if stats.get('novos',0) == 0 and stats.get('atualizados',0) == 0:
-                flash("Nenhum dispositivo sincronizado. Verifique TUYA_DEVICE_ID ou ID informado.", 'warning')
-            else:
-                flash(f"Sincronização: {stats.get('novos',0)} novos, {stats.get('atualizados',0)} atualizados{extra}", 'success')
+        # Chamadas à Tuya podem levar segundos: roda fora da requisição
+        job_id = enqueue_device_sync(
+            current_app._get_current_object(),
+            usuario_id=g.user_id,
+            force_device_id=device_id_forced,
+        )
+        extra = ' (modo device único)' if device_id_forced else ''
+        flash(f"Sincronização iniciada em segundo plano{extra} (job {job_id}). Atualize a página em instantes.", 'info')
     except Exception as e:
         flash(f"Erro inesperado: {e}", 'danger')
     return redirect(url_for('aparelhos.listar'))
 
 
+@aparelhos_bp.route('/aparelhos/sync-status/<job_id>')
+@login_required
+def sync_status(job_id: str):
+    """Andamento de uma sincronização Tuya disparada por /aparelhos/sincronizar-tuya."""
+    job = get_sync_job(job_id, g.user_id)
+    if job is None:
+        return {"error": "Job não encontrado."}, 404
+    return {"job_id": job_id, **job}, 200
+
+
 @aparelhos_bp.route('/aparelhos/consumo-atual/<int:aparelho_id>')
 @login_required
 def consumo_atual(aparelho_id: int):
     """Retorna potência estimada ou em tempo real (se ampliado no futuro)."""
     try:
-        ap = Aparelho.query.filter_by(id=aparelho_id, usuario_id=session['usuario_id']).first()
+        ap = _get_owned(aparelho_id, g.user_id)
         if not ap:
             return jsonify({'error': 'Aparelho não encontrado'}), 404
 
         # Se for Tuya (tem codigo_externo) tenta obter potência real
+        metrics = None
         if ap.codigo_externo:
             try:
-                from services.tuya_client import TuyaClient
-                client = TuyaClient()
-                status_resp = client.get_device_status_by_id(ap.codigo_externo)
-                
-                # Usar o parser centralizado do TuyaClient
-                metrics = client.parse_metrics(status_resp)
-                
-                potencia_w = metrics.get('power_w')
-                switch_on = metrics.get('switch_on')
-
-                # Atualiza o status no banco de dados local para manter a consistência
-                if switch_on is not None and ap.status != switch_on:
-                    ap.status = switch_on
-                    db.session.commit()
-
-                if potencia_w is not None:
-                    return jsonify({
-                        'potencia': round(potencia_w, 2),
-                        'status': switch_on,
-                        'fonte': 'tuya',
-                        'timestamp': datetime.utcnow().isoformat() + 'Z'
-                    })
+                metrics = _tuya_metrics(ap.codigo_externo)
             except Exception as e:
+                # Cai para estimativa se der erro
                 logger.error(f"Falha ao buscar status real da Tuya para {ap.codigo_externo}: {e}")
+
+        payload = _consumo_payload(ap, metrics)
+        return _conditional_json(payload, _consumo_chave(payload))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@aparelhos_bp.route('/aparelhos/consumo-atual/bulk', methods=['GET', 'POST'])
+@login_required
+def consumo_atual_bulk():
+    """Potência/status de vários aparelhos em uma requisição: ``{id: {...}}``.
+
+    IDs via ``?ids=1,2,3`` ou JSON ``{"ids": [1, 2, 3]}``. Uma consulta ao banco
+    e uma busca em lote na Tuya para todos os aparelhos com codigo_externo.
+    """
+    if request.method == 'POST':
+        ids = (request.get_json(silent=True) or {}).get('ids') or []
+    else:
+        ids = request.args.get('ids', '').split(',')
+    try:
+        ids = {int(i) for i in ids if str(i).strip()}
+    except (TypeError, ValueError):
+        return jsonify({'error': 'ids deve ser uma lista de inteiros'}), 400
+    if not ids:
+        return jsonify({})
+
+    try:
+        aparelhos = db.session.execute(
+            db.select(Aparelho)
+            .where(Aparelho.id.in_(ids), Aparelho.usuario_id == g.user_id)
+        ).scalars().all()
+
+        metrics = {}
+        codigos = [ap.codigo_externo for ap in aparelhos if ap.codigo_externo]
+        if codigos:
+            try:
+                metrics = _tuya_metrics_many(codigos)
+            except Exception as e:
                 # Cai para estimativa se der erro
-                pass
-
-        # Estimativa: consumo_kwh_dia -> potência média assumindo 4h ativo
-        potencia_estimada = round(ap.consumo * 1000 / 4, 2)
-        return jsonify({
-            'potencia': potencia_estimada,
-            'fonte': 'estimado',
-            'status': ap.status, # Retorna o status do banco de dados
-            'timestamp': datetime.utcnow().isoformat() + 'Z'
-        })
+                logger.error(f"Falha ao buscar status real da Tuya em lote ({len(codigos)} devices): {e}")
+
+        payload = {ap.id: _consumo_payload(ap, metrics.get(ap.codigo_externo)) for ap in aparelhos}
+        return _conditional_json(payload, sorted((k, _consumo_chave(v)) for k, v in payload.items()))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -452,25 +651,20 @@ def obter_status(aparelho_id: int):
     Returns:
         tuple: JSON response with device status and HTTP code
     """
-    if not _ensure_authenticated():
-        return {"error": "Usuário não autenticado."}, 401
-
     try:
-        aparelho = Aparelho.query.filter_by(
-            id=aparelho_id, 
-            usuario_id=session['usuario_id']
-        ).first()
+        aparelho = _get_owned(aparelho_id, g.user_id)
 
         if not aparelho:
             return {"error": "Aparelho não encontrado."}, 404
 
-        return {
+        payload = {
             "id": aparelho.id,
             "nome": aparelho.nome,
             "status": aparelho.status,
             "consumo": aparelho.consumo,
             "prioridade": aparelho.prioridade
-        }, 200
+        }
+        return _conditional_json(payload, tuple(payload.values()))
 
     except Exception as e:
         logger.error(f"Error getting device status: {e}")
@@ -9,7 +9,7 @@ import os
 import json
 import time
 from datetime import datetime, timedelta
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, current_app, g, jsonify, request, session
 import random
 from solarmind.mock_data_store import get_mock_daily_state, get_mock_battery_level
 from solarmind.services.gemini_client import generate_gemini_text
@@ -18,11 +18,11 @@ from solarmind.services.weather_client import get_weather_forecast
 from extensions import logger
 from services.goodwe_client import GoodWeClient
 from services.gemini_client import GeminiClient
-from services.tuya_client import TuyaClient
+from services.tuya_client import TuyaClient, get_shared_client
 from services.smartplug_service import latest_readings, summary
 from services.smartplug_service import collect_and_store
 from services.scheduler import get_jobs_info
-from models.aparelho import Aparelho
+from models.aparelho import Aparelho, aparelhos_alterados
 from extensions import db
 
 # Inicializar blueprint
@@ -31,6 +31,19 @@ api_bp = Blueprint('api', __name__)
 # Inicializar clientes
 goodwe_client = GoodWeClient()
 
+
+def _agora() -> datetime:
+    """Horário local da requisição, calculado uma vez e reaproveitado via ``g``."""
+    if 'now' not in g:
+        g.now = datetime.now()
+    return g.now
+
+def _agora_iso() -> str:
+    """``_agora()`` em ISO 8601 (campo ``timestamp`` das respostas)."""
+    if 'now_iso' not in g:
+        g.now_iso = _agora().isoformat()
+    return g.now_iso
+
 @api_bp.route('/api/solar/debug_goodwe')
 def debug_goodwe():
     """Endpoint de depuração para inspecionar estado do cliente GoodWe."""
@@ -45,11 +58,24 @@ def debug_goodwe():
                 'strict_https': getattr(goodwe_client, 'strict_https', None),
                 'debug': getattr(goodwe_client, 'debug', None),
             },
-            'timestamp': datetime.now().isoformat()
+            'timestamp': _agora_iso()
         })
     except Exception as e:
         return jsonify({'ok': False, 'error': str(e)}), 500
 
+def _json_bytes_response(body: bytes, status: int = 200):
+    """Resposta com corpo JSON já serializado (sem passar por jsonify)."""
+    return current_app.response_class(body, status=status, mimetype='application/json')
+
+# Corpo fixo do health check; só o pool e o timestamp variam por chamada
+_STATUS_FMT = '{"ok":true,"msg":"API SolarMind funcionando","db_pool":%s,"timestamp":"%s"}'
+
+@api_bp.route('/api/status')
+def status():
+    """Health check da API, com a ocupação do pool de conexões do banco."""
+    body = _STATUS_FMT % (json.dumps(db.engine.pool.status()), _agora_iso())
+    return _json_bytes_response(body.encode('utf-8'))
+
 # ---------------------- SIMPLE IN-MEMORY CACHE ---------------------- #
 _CACHE: dict[str, tuple[float, dict]] = {}
 
@@ -65,35 +91,52 @@ def _cache_get(key: str):
 
 def _cache_set(key: str, value: dict, ttl: int):
     _CACHE[key] = (time.time() + ttl, value)
+
+def _ia_decisao(prompt: str):
+    """Resposta da IA (JSON decodificado) para o prompt, reaproveitada por 5 minutos.
+
+    O prompt já contém os dados de entrada (bateria, previsão), então serve de chave.
+    """
+    cache_key = f'ia:{prompt}'
+    data = _cache_get(cache_key)
+    if data is None:
+        response_json_str = generate_gemini_text(prompt)
+        data = json.loads(response_json_str) if isinstance(response_json_str, str) else response_json_str
+        _cache_set(cache_key, data, ttl=300)
+    return data
 gemini_client = GeminiClient()
-tuya_client: TuyaClient | None = None  # Inicializado sob demanda
 
 def _get_tuya_client() -> TuyaClient:
-    global tuya_client
-    if tuya_client is None:
-        try:
-            tuya_client = TuyaClient()
-        except Exception as e:
-            logger.error(f"Falha ao inicializar TuyaClient: {e}")
-            raise
-    return tuya_client
+    try:
+        return get_shared_client()
+    except Exception as e:
+        logger.error(f"Falha ao inicializar TuyaClient: {e}")
+        raise
 
 # ---------------------- Controle Unificado de Dispositivos ---------------------- #
-def _find_device(reference: str) -> Aparelho | None:
-    """Procura aparelho por nome (case-insensitive), slug simplificado ou codigo_externo."""
+# Colunas usadas pelo controle de dispositivos (sem materializar o objeto ORM)
+_DEVICE_COLUMNS = (Aparelho.id, Aparelho.usuario_id, Aparelho.codigo_externo)
+
+def _find_device(reference: str):
+    """Procura aparelho por nome (case-insensitive), slug simplificado ou codigo_externo.
+
+    Retorna a linha ``(id, usuario_id, codigo_externo)`` ou None.
+    """
     if not reference:
         return None
     ref = reference.strip().lower()
     ap = (Aparelho.query
-          .filter(Aparelho.nome.ilike(ref))
+          .with_entities(*_DEVICE_COLUMNS)
+          .filter(db.func.lower(Aparelho.nome) == ref)
           .first())
     if not ap:
         ap = (Aparelho.query
+              .with_entities(*_DEVICE_COLUMNS)
               .filter(Aparelho.codigo_externo.ilike(ref))
               .first())
     return ap
 
-def _send_tuya_if_possible(aparelho: Aparelho | None, desired: bool) -> tuple[bool, dict | None]:
+def _send_tuya_if_possible(aparelho, desired: bool) -> tuple[bool, dict | None]:
     """Envia comando Tuya se aparelho tiver codigo_externo e retorna (sucesso, resposta_raw)."""
     if not aparelho or not aparelho.codigo_externo:
         return False, None
@@ -128,11 +171,18 @@ def control_device(target: str, turn_on: bool) -> dict:
         if tuya_raw:
             result['tuya_raw'] = tuya_raw
         # Atualiza estado local sempre (mesmo se Tuya falhou para manter coerência interna)
-        ap.status = bool(turn_on)
-        if not ap.origem:
-            ap.origem = 'tuya' if ap.codigo_externo else 'manual'
         try:
+            db.session.execute(
+                db.update(Aparelho)
+                .where(Aparelho.id == ap.id)
+                .values(
+                    status=bool(turn_on),
+                    origem=db.func.coalesce(Aparelho.origem, 'tuya' if ap.codigo_externo else 'manual'),
+                )
+                .execution_options(synchronize_session=False)
+            )
             db.session.commit()
+            aparelhos_alterados.send(ap.usuario_id)
         except Exception as e:
             db.session.rollback()
             result['db_error'] = str(e)
@@ -274,6 +324,12 @@ def ifttt_modo_economia():
         logger.error(f"Erro /ifttt/modo_economia: {e}")
         return jsonify({'ok': False, 'success': False, 'error': str(e)}), 500
 
+_SOLAR_CONFIG_ENDPOINTS = (
+    '/api/solar/status - Status atual do sistema',
+    '/api/solar/data - Dados completos de produção e bateria',
+    '/api/solar/history - Histórico dos últimos dias',
+)
+
 @api_bp.route('/api/solar/config')
 def solar_config():
     """
@@ -297,13 +353,9 @@ def solar_config():
                 'inverter_id': bool(inverter_id)
             },
             'regiao_sems': region,
-            'endpoints_disponiveis': [
-                '/api/solar/status - Status atual do sistema',
-                '/api/solar/data - Dados completos de produção e bateria',
-                '/api/solar/history - Histórico dos últimos dias'
-            ]
+            'endpoints_disponiveis': _SOLAR_CONFIG_ENDPOINTS
         },
-        'timestamp': datetime.now().isoformat()
+        'timestamp': _agora_iso()
     })
 
 
@@ -319,7 +371,7 @@ def solar_status():
                 print("--- ROTA /api/solar/status: Chamando get_realtime_data() ---")
                 dados_reais = goodwe_client.get_realtime_data()
                 # Mantém o envelope com 'ok' para compatibilidade, mas os dados vêm do realtime
-                return jsonify({'ok': True, 'data': dados_reais, 'timestamp': datetime.now().isoformat(), '_mock': False})
+                return jsonify({'ok': True, 'data': dados_reais, 'timestamp': _agora_iso(), '_mock': False})
             except Exception as e:
                 print(f"ERRO na API real, usando fallback para mock: {e}")
                 logger.error(f"Erro /api/solar/status (api): {e}")
@@ -333,7 +385,7 @@ def solar_status():
             'economia_dia': state['economia_dia'],
             'status_sistema': 'ONLINE'
         }
-        return jsonify({'ok': True, 'data': mock_data, 'timestamp': datetime.now().isoformat(), '_mock': True, 'fallback': fonte=='api'})
+        return jsonify({'ok': True, 'data': mock_data, 'timestamp': _agora_iso(), '_mock': True, 'fallback': fonte=='api'})
     except Exception as e:
         logger.error(f"Erro /api/solar/status: {e}")
         return jsonify({'ok': False, 'error': str(e)}), 500
@@ -352,7 +404,7 @@ def debug_realtime_raw_data():
         return jsonify({
             'ok': True,
             'raw': raw_payload,
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': _agora_iso(),
             'hint': 'Este payload é retornado diretamente da API GoodWe (GetMonitorDetailByPowerstationId)'
         })
     except Exception as e:
@@ -374,7 +426,7 @@ def get_daily_report():
                     'economia_dia': dados.get('economia', {}).get('hoje', 0.0),
                     'soc_bateria': dados.get('bateria', {}).get('soc', None)
                 }
-                return jsonify({'ok': True, 'data': report_data, 'timestamp': datetime.now().isoformat(), '_mock': False})
+                return jsonify({'ok': True, 'data': report_data, 'timestamp': _agora_iso(), '_mock': False})
             except Exception as e:
                 print(f"ERRO na API real, usando fallback para mock: {e}")
                 logger.error(f"Erro /api/solar/relatorio_diario (api): {e}")
@@ -386,7 +438,7 @@ def get_daily_report():
             'economia_dia': state['economia_dia'],
             'soc_bateria': state.get('soc_bateria')
         }
-        return jsonify({'ok': True, 'data': report_data, 'timestamp': datetime.now().isoformat(), '_mock': True, 'fallback': fonte=='api'})
+        return jsonify({'ok': True, 'data': report_data, 'timestamp': _agora_iso(), '_mock': True, 'fallback': fonte=='api'})
     except Exception as e:
         logger.error(f"Erro em /api/solar/relatorio_diario: {e}")
         return jsonify({'ok': False, 'error': str(e)}), 500
@@ -440,8 +492,7 @@ def get_daily_plan():
         - Previsao_hoje: {weather_today}
         """
 
-        response_json_str = generate_gemini_text(prompt)
-        data = json.loads(response_json_str) if isinstance(response_json_str, str) else response_json_str
+        data = _ia_decisao(prompt)
 
         return jsonify({
             'ok': True,
@@ -450,7 +501,7 @@ def get_daily_plan():
                 'soc_bateria': battery_level,
                 'previsao': weather_today
             },
-            'timestamp': datetime.now().isoformat()
+            'timestamp': _agora_iso()
         })
     except Exception as e:
         logger.error(f"Erro CRÍTICO em /api/ia/plano_do_dia: {e}")
@@ -493,8 +544,7 @@ Dados:
 """
 
         # d) Chamada à IA (mock) que retorna string JSON
-        response_json_str = generate_gemini_text(prompt)
-        data = json.loads(response_json_str) if isinstance(response_json_str, str) else response_json_str
+        data = _ia_decisao(prompt)
         if not isinstance(data, dict) or 'acao' not in data or 'explicacao' not in data:
             raise ValueError('Resposta do Gemini não possui chaves esperadas.')
 
@@ -513,7 +563,7 @@ def solar_data():
         return jsonify({**cached, '_cache': True})
     try:
         dados = goodwe_client.build_data()
-        payload = {'ok': True, 'data': dados, 'timestamp': datetime.now().isoformat()}
+        payload = {'ok': True, 'data': dados, 'timestamp': _agora_iso()}
         _cache_set(cache_key, payload, ttl=120)
         return jsonify({**payload, '_cache': False})
     except ValueError as ve:
@@ -540,7 +590,7 @@ def solar_history():
             'periodo': f'{days_clamped}_dias',
             'fonte_dados': 'GOODWE_SEMS_API',
             'inverter_id': goodwe_client.inverter_id,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': _agora_iso()
         }
         _cache_set(cache_key, payload, ttl=600)
         return jsonify({**payload, '_cache': False})
@@ -560,7 +610,7 @@ def solar_intraday_series():
         return jsonify({**cached, '_cache': True})
     try:
         series_data = goodwe_client.build_intraday_series()
-        payload = {'ok': True, 'data': series_data, 'timestamp': datetime.now().isoformat()}
+        payload = {'ok': True, 'data': series_data, 'timestamp': _agora_iso()}
         # Cache mais curto para dados que mudam com frequência
         _cache_set(cache_key, payload, ttl=300) # 5 minutos
         return jsonify({**payload, '_cache': False})
@@ -691,18 +741,44 @@ def tuya_device_switch(device_id: str):
 # TODOS os outros endpoints foram REMOVIDOS por usarem dados simulados
 # Se precisar de funcionalidades específicas, implemente usando dados reais da GoodWe SEMS
 
+def _nao_implementado(error: str, message: str) -> bytes:
+    """Serializa (uma vez, no import) a resposta 501 de um endpoint sem dados reais."""
+    return json.dumps({
+        'ok': False,
+        'error': error,
+        'message': message,
+        'status': 'NOT_IMPLEMENTED_REAL_DATA_ONLY'
+    }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+_SOLAR_INSIGHTS_501 = _nao_implementado(
+    'Endpoint não implementado para dados reais',
+    'Este endpoint requer integração completa com dados reais do GoodWe SEMS',
+)
+_ALEXA_STATUS_501 = _nao_implementado(
+    'Endpoint Alexa não implementado para dados reais',
+    'Este endpoint requer integração completa com dados reais do GoodWe SEMS',
+)
+_WEBHOOK_IFTTT_501 = _nao_implementado(
+    'Webhook IFTTT não implementado para dados reais',
+    'Este webhook requer integração completa com dados reais do GoodWe SEMS',
+)
+_ENERGIA_PREVISAO_501 = _nao_implementado(
+    'Previsão de energia não implementada para dados reais',
+    'Este endpoint requer algoritmos de ML com dados reais do GoodWe SEMS',
+)
+_AUTOMACAO_ESTATISTICAS_501 = _nao_implementado(
+    'Estatísticas não implementadas para dados reais',
+    'Este endpoint requer análise de dados históricos reais do GoodWe SEMS',
+)
+
+
 @api_bp.route('/api/solar/insights')
 def solar_insights():
     """
     Endpoint para insights inteligentes do sistema solar.
     SOMENTE DADOS REAIS - ENDPOINT NÃO IMPLEMENTADO
     """
-    return jsonify({
-        'ok': False,
-        'error': 'Endpoint não implementado para dados reais',
-        'message': 'Este endpoint requer integração completa com dados reais do GoodWe SEMS',
-        'status': 'NOT_IMPLEMENTED_REAL_DATA_ONLY'
-    }), 501
+    return _json_bytes_response(_SOLAR_INSIGHTS_501, status=501)
 
 
 @api_bp.route('/api/alexa/status')
@@ -710,12 +786,7 @@ def alexa_status():
     """
     Endpoint Alexa - NÃO IMPLEMENTADO para dados reais
     """
-    return jsonify({
-        'ok': False,
-        'error': 'Endpoint Alexa não implementado para dados reais',
-        'message': 'Este endpoint requer integração completa com dados reais do GoodWe SEMS',
-        'status': 'NOT_IMPLEMENTED_REAL_DATA_ONLY'
-    }), 501
+    return _json_bytes_response(_ALEXA_STATUS_501, status=501)
 
 
 @api_bp.route('/api/webhook/ifttt/energia', methods=['POST'])
@@ -723,12 +794,7 @@ def webhook_ifttt_energia():
     """
     Webhook IFTTT - NÃO IMPLEMENTADO para dados reais
     """
-    return jsonify({
-        'ok': False,
-        'error': 'Webhook IFTTT não implementado para dados reais',
-        'message': 'Este webhook requer integração completa com dados reais do GoodWe SEMS',
-        'status': 'NOT_IMPLEMENTED_REAL_DATA_ONLY'
-    }), 501
+    return _json_bytes_response(_WEBHOOK_IFTTT_501, status=501)
 
 
 @api_bp.route('/api/energia/previsao')
@@ -736,12 +802,7 @@ def energia_previsao():
     """
     Previsão de energia - NÃO IMPLEMENTADO para dados reais
     """
-    return jsonify({
-        'ok': False,
-        'error': 'Previsão de energia não implementada para dados reais',
-        'message': 'Este endpoint requer algoritmos de ML com dados reais do GoodWe SEMS',
-        'status': 'NOT_IMPLEMENTED_REAL_DATA_ONLY'
-    }), 501
+    return _json_bytes_response(_ENERGIA_PREVISAO_501, status=501)
 
 
 @api_bp.route('/api/automacao/estatisticas')
@@ -749,12 +810,13 @@ def automacao_estatisticas():
     """
     Estatísticas de automação - NÃO IMPLEMENTADO para dados reais
     """
-    return jsonify({
-        'ok': False,
-        'error': 'Estatísticas não implementadas para dados reais',
-        'message': 'Este endpoint requer análise de dados históricos reais do GoodWe SEMS',
-        'status': 'NOT_IMPLEMENTED_REAL_DATA_ONLY'
-    }), 501
+    return _json_bytes_response(_AUTOMACAO_ESTATISTICAS_501, status=501)
+
+
+# Faixas (geração kWh, SOC %) dos dados simulados de /api/insights, por hora do dia
+_FAIXA_DIA = ((8.5, 24.3), (45, 85))  # 6h às 18h
+_FAIXA_NOITE = ((0.1, 2.1), (15, 45))
+_FAIXAS_SIMULADAS_POR_HORA = tuple(_FAIXA_DIA if 6 <= h <= 18 else _FAIXA_NOITE for h in range(24))
 
 
 @api_bp.route('/api/insights', methods=['POST'])
@@ -766,7 +828,6 @@ def generate_insights():
     """
     try:
         # Coletar dados atuais do sistema
-        from flask import g
         from flask_login import current_user
 
         # Verificar se usuário está logado
@@ -800,13 +861,9 @@ def generate_insights():
         # Dados simulados realistas se não houver dados reais
         if energia_gerada == 0:
             # Simular dados baseados na hora do dia
-            hora_atual = datetime.now().hour
-            if 6 <= hora_atual <= 18:  # Durante o dia
-                energia_gerada = round(random.uniform(8.5, 24.3), 1)
-                soc_bateria = min(95, round(random.uniform(45, 85), 0))
-            else:  # Durante a noite
-                energia_gerada = round(random.uniform(0.1, 2.1), 1)
-                soc_bateria = round(random.uniform(15, 45), 0)
+            (ger_min, ger_max), (soc_min, soc_max) = _FAIXAS_SIMULADAS_POR_HORA[_agora().hour]
+            energia_gerada = round(random.uniform(ger_min, ger_max), 1)
+            soc_bateria = round(random.uniform(soc_min, soc_max), 0)
         
         if energia_consumida == 0:
             energia_consumida = round(random.uniform(12.8, 18.7), 1)
@@ -819,7 +876,7 @@ def generate_insights():
             'soc_bateria': soc_bateria,
             'economia_estimada': economia_estimada,
             'temperatura_atual': 25,  # Placeholder - poderia vir da API de clima
-            'horario_atual': datetime.now().hour
+            'horario_atual': _agora().hour
         }
 
         # Gerar insights usando Gemini
@@ -850,6 +907,15 @@ def generate_insights():
 
 
 # Catch-all para endpoints removidos
+_ENDPOINTS_DISPONIVEIS = (
+    '/api/status',
+    '/api/solar/status',
+    '/api/solar/data',
+    '/api/solar/history',
+    '/api/solar/config',
+    '/api/insights',
+)
+
 @api_bp.route('/api/<path:endpoint>')
 def endpoint_removido(endpoint):
     """
@@ -859,12 +925,5 @@ def endpoint_removido(endpoint):
         'ok': False,
         'error': f'Endpoint /api/{endpoint} foi removido',
         'message': 'Endpoint usava dados simulados e foi removido. Somente dados reais são suportados.',
-        'endpoints_disponiveis': [
-            '/api/status',
-            '/api/solar/status',
-            '/api/solar/data',
-            '/api/solar/history',
-            '/api/solar/config',
-            '/api/insights'
-        ]
+        'endpoints_disponiveis': _ENDPOINTS_DISPONIVEIS
     }), 404
\ No newline at end of file
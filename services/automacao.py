@@ -8,7 +8,7 @@ device control, peak hour management, and consumption optimization.
 import datetime
 from typing import Dict, List, Optional, Tuple
 from models.aparelho import Aparelho
-from utils.energia import dispara_alerta
+from utils.energia import dispara_alerta_async
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -267,20 +267,23 @@ class AutomacaoEnergia:
         
         if consumo_atual > limite:
             desligamentos = self.sugerir_desligamentos(aparelhos, consumo_atual)
+            por_id = {ap.id: ap for ap in aparelhos}
+            desligados = []
             for sugestao in desligamentos:
-                aparelho_id = sugestao['aparelho_id']
-                aparelho = next((ap for ap in aparelhos if ap.id == aparelho_id), None)
+                aparelho = por_id.get(sugestao['aparelho_id'])
                 
                 if aparelho and aparelho.status:
                     # Here would implement actual device control
                     acoes_executadas.append(f"Desligado: {aparelho.nome}")
                     energia_economizada += aparelho.consumo
-                    
-                    # Send alert
-                    dispara_alerta(
-                        "automacao_desligamento",
-                        f"Aparelho {aparelho.nome} foi desligado automaticamente para economia de energia"
-                    )
+                    desligados.append(aparelho.nome)
+            
+            # One alert per run listing every device, instead of one webhook per device
+            if desligados:
+                dispara_alerta_async(
+                    "automacao_desligamento",
+                    f"Aparelho(s) {', '.join(desligados)} desligado(s) automaticamente para economia de energia"
+                )
         
         return {
             'acoes_executadas': acoes_executadas,
@@ -9,8 +9,9 @@ from datetime import datetime
 import logging
 
 from extensions import db
-from models.aparelho import Aparelho
+from models.aparelho import Aparelho, aparelhos_alterados
 from services.tuya_client import TuyaClient
+from utils.slug import slugify
 
 logger = logging.getLogger(__name__)
 
@@ -57,6 +58,22 @@ def sync_tuya_devices(usuario_id: int | None = None, force_device_id: str | None
         stats = {"encontrados": 0, "novos": 0, "atualizados": 0}
         uid = usuario_id or 1  # suposição: usuário 1 padrão
 
+        # Aparelhos já cadastrados do usuário em uma única consulta (sem N SELECTs no loop)
+        existentes = db.session.execute(
+            db.select(Aparelho.id, Aparelho.codigo_externo, Aparelho.nome, Aparelho.origem)
+            .filter_by(usuario_id=uid)
+        ).all()
+        por_codigo = {row.codigo_externo: row for row in existentes if row.codigo_externo}
+        por_nome = {row.nome: row for row in existentes}
+
+        # Status (potência atual) de todos os devices em lote, em paralelo
+        statuses = client.get_device_statuses([dev.get("id") for dev in devices if dev.get("id")])
+
+        to_insert: list[dict] = []
+        to_update: list[dict] = []
+        novos_por_codigo: dict[str, dict] = {}
+        novos_por_nome: dict[str, dict] = {}
+
         for dev in devices:
             stats["encontrados"] += 1
             dev_id = dev.get("id")
@@ -75,7 +92,7 @@ def sync_tuya_devices(usuario_id: int | None = None, force_device_id: str | None
             # Obter potência atual
             potencia_w = None
             try:
-                status_resp = client.get_device_status_by_id(dev_id)
+                status_resp = statuses.get(dev_id) or {}
                 status_list = status_resp.get("result", {}).get("status", [])
                 for item in status_list:
                     if item.get("code") == "cur_power":
@@ -86,37 +103,55 @@ def sync_tuya_devices(usuario_id: int | None = None, force_device_id: str | None
             except Exception as e:
                 logger.error(f"[DeviceSync] Erro lendo status {dev_id}: {e}")
 
-            # Primeiro procura por codigo_externo (idempotência)
-            aparelho = Aparelho.query.filter_by(codigo_externo=dev_id, usuario_id=uid).first()
-            if not aparelho:
-                # Fallback legado (antes de termos codigo_externo): busca por nome
-                aparelho = Aparelho.query.filter_by(nome=nome, usuario_id=uid).first()
-            if not aparelho:
+            # Primeiro procura por codigo_externo (idempotência); fallback legado
+            # (antes de termos codigo_externo): busca por nome
+            aparelho = por_codigo.get(dev_id) or por_nome.get(nome)
+            novo = novos_por_codigo.get(dev_id) or novos_por_nome.get(nome)
+            if aparelho is None and novo is None:
                 # O modelo atual usa campos: nome, consumo (kWh), prioridade, status, usuario_id
                 # Vamos mapear potencia instantânea aproximada para consumo diário estimado inicial
                 consumo_kwh_estimado = round(((potencia_w or 50) * 4) / 1000.0, 3)  # suposição: 4h/dia
-                aparelho = Aparelho(
-                    nome=nome,
-                    consumo=consumo_kwh_estimado,
-                    prioridade=3,
-                    usuario_id=uid,
-                    codigo_externo=dev_id,
-                    origem='tuya'
-                )
-                db.session.add(aparelho)
+                novo = {
+                    "nome": nome,
+                    "slug": slugify(nome),
+                    "consumo": consumo_kwh_estimado,
+                    "prioridade": 3,
+                    "status": True,
+                    "usuario_id": uid,
+                    "codigo_externo": dev_id,
+                    "origem": "tuya",
+                }
+                to_insert.append(novo)
+                novos_por_codigo[dev_id] = novos_por_nome[nome] = novo
                 stats["novos"] += 1
+            elif novo is not None:
+                # Mesmo device repetido na resposta: atualiza a linha ainda não gravada
+                if potencia_w:
+                    novo["consumo"] = round(((potencia_w) * 4) / 1000.0, 3)
+                stats["atualizados"] += 1
             else:
+                alteracoes = {"id": aparelho.id}
                 # Atualiza consumo estimado se potência nova válida
                 if potencia_w:
-                    aparelho.consumo = round(((potencia_w) * 4) / 1000.0, 3)
+                    alteracoes["consumo"] = round(((potencia_w) * 4) / 1000.0, 3)
                 # Garante que campos novos sejam preenchidos se ainda faltarem
                 if not aparelho.codigo_externo:
-                    aparelho.codigo_externo = dev_id
+                    alteracoes["codigo_externo"] = dev_id
                 if not aparelho.origem:
-                    aparelho.origem = 'tuya'
+                    alteracoes["origem"] = 'tuya'
+                if len(alteracoes) > 1:
+                    to_update.append(alteracoes)
                 stats["atualizados"] += 1
 
+        # Um INSERT executemany + um UPDATE em lote por chave primária, um único commit
+        if to_insert:
+            db.session.execute(db.insert(Aparelho), to_insert)
+        if to_update:
+            db.session.execute(db.update(Aparelho), to_update)
         db.session.commit()
+        if to_insert or to_update:
+            # Gravações em lote não disparam os eventos de mapper dos caches
+            aparelhos_alterados.send(uid)
         logger.info(f"[DeviceSync] Concluído: {stats}")
         return stats
     except Exception as e:
@@ -11,24 +11,59 @@ import os
 from datetime import datetime, timedelta
 import requests
 from utils.logger import get_logger
+from utils.timefmt import utc_now_iso
 from urllib.parse import urlparse
 
 logger = get_logger(__name__)
 
+BASE_URLS = {
+    "us": "https://us.semsportal.com/api/",
+    "eu": "https://eu.semsportal.com/api/",
+}
+
+# Endpoints por região, montados uma única vez
+URLS = {
+    region: {
+        "base": base,
+        "login": f"{base}v2/common/crosslogin",
+        "monitor_detail": f"{base}v2/PowerStation/GetMonitorDetailByPowerstationId",
+        "station_list": f"{base}v2/PowerStation/GetPowerStationListByUserId",
+        "inverter_data_by_column": f"{base}PowerStationMonitor/GetInverterDataByColumn",
+    }
+    for region, base in BASE_URLS.items()
+}
+
+# Token inicial (pré-login): payload estático, codificado uma única vez
+_INITIAL_TOKEN = base64.b64encode(json.dumps({
+    "uid": "",
+    "timestamp": 0,
+    "token": "",
+    "client": "web",
+    "version": "",
+    "language": "en",
+}).encode('utf-8')).decode('utf-8')
+
+# Headers do CrossLogin (não variam entre tentativas/regiões)
+_LOGIN_HEADERS = {
+    "Token": _INITIAL_TOKEN,
+    "Content-Type": "application/json",
+    "Accept": "*/*",
+    "Origin": "https://semsportal.com",
+    "Referer": "https://semsportal.com/",
+}
+
 
 class GoodWeClient:
     """
     Cliente para GoodWe SEMS Portal API.
     """
 
-    BASE_URLS = {
-        "us": "https://us.semsportal.com/api/",
-        "eu": "https://eu.semsportal.com/api/",
-    }
+    BASE_URLS = BASE_URLS
 
-    def __init__(self, region: str = "us"):
+    def __init__(self, region: str = "us", session: requests.Session | None = None):
         self.region = region
-        self.session = requests.Session()
+        # Sessão HTTP (pode ser compartilhada, ex: services.http_session.SESSION)
+        self.session = session if session is not None else requests.Session()
         self.session.headers.update({
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
             "Accept": "application/json",
@@ -68,16 +103,8 @@ class GoodWeClient:
         return self.BASE_URLS.get(self.region, self.BASE_URLS["us"])
 
     def _generate_initial_token(self) -> str:
-        """Gera token inicial no formato minimalista (compatível com exemplo professor)."""
-        token_data = {
-            "uid": "",
-            "timestamp": 0,
-            "token": "",
-            "client": "web",
-            "version": "",
-            "language": "en",
-        }
-        return base64.b64encode(json.dumps(token_data).encode('utf-8')).decode('utf-8')
+        """Retorna o token inicial no formato minimalista (compatível com exemplo professor)."""
+        return _INITIAL_TOKEN
 
     def crosslogin(self, account: str, password: str) -> str | None:
         """
@@ -94,15 +121,7 @@ class GoodWeClient:
         self.account = account
         self.password = password
 
-        url = f"{self._get_base_url()}v2/common/crosslogin"
-
-        headers = {
-            "Token": self._generate_initial_token(),
-            "Content-Type": "application/json",
-            "Accept": "*/*",
-            "Origin": "https://semsportal.com",
-            "Referer": "https://semsportal.com/",
-        }
+        headers = _LOGIN_HEADERS
 
         payload = {
             "account": account,
@@ -119,7 +138,7 @@ class GoodWeClient:
 
         for attempt, region in enumerate(regions_to_try, start=1):
             self.region = region
-            url = f"{self._get_base_url()}v2/common/crosslogin"
+            url = URLS.get(region, URLS["us"])["login"]
             tried_regions.append(region)
             try:
                 logger.info(
@@ -383,6 +402,8 @@ class GoodWeClient:
                     self._dbg("[FETCH] Falha ao renovar token - abortando")
                     break
                 current_token = new_token
+                # Reaproveita o token renovado nas próximas chamadas (_get_token)
+                self._token_cache = {'token': new_token, 'ts': datetime.utcnow()}
                 if self._data_base_url_override and self._data_base_url_override not in candidates:
                     candidates.insert(0, self._data_base_url_override)
             else:
@@ -402,7 +423,7 @@ class GoodWeClient:
             if not raw_token:
                 return {"error": True, "stage": "login", "details": "login falhou"}
             region_sanitized = region if region in ("eu", "us") else "eu"
-            url = f"https://{region_sanitized}.semsportal.com/api/PowerStationMonitor/GetInverterDataByColumn"
+            url = URLS[region_sanitized]["inverter_data_by_column"]
             headers = {"Token": raw_token, "Content-Type": "application/json", "Accept": "*/*"}
             # Aplicar atraso de 5 minutos para depuração, se vier data/hora completa
             try:
@@ -752,7 +773,7 @@ class GoodWeClient:
                     'soc_bateria': round(realtime_data.get('soc_bateria', 0.0), 1),
                     'temperatura': 0,
                     'status_inversor': 'Operando' if pac_w > 0 else 'Standby',
-                    'ultima_atualizacao': datetime.utcnow().isoformat() + 'Z',
+                    'ultima_atualizacao': utc_now_iso(),
                     'fonte_dados': 'GOODWE_REALTIME_API',
                     'inverter_id': self.inverter_id
                 }
@@ -810,7 +831,7 @@ class GoodWeClient:
             'soc_bateria': round(soc, 1) if isinstance(soc, (int, float)) else 0.0,
             'temperatura': 0,
             'status_inversor': 'Operando' if pac_w > 0 else 'Standby',
-            'ultima_atualizacao': datetime.utcnow().isoformat() + 'Z',
+            'ultima_atualizacao': utc_now_iso(),
             'fonte_dados': 'GOODWE_SEMS_API',
             'inverter_id': self.inverter_id
         }
@@ -858,7 +879,7 @@ class GoodWeClient:
                     'meta_dados': {
                         'fonte_dados': 'GOODWE_REALTIME_API',
                         'inverter_id': self.inverter_id,
-                        'ultima_sincronizacao': datetime.utcnow().isoformat() + 'Z'
+                        'ultima_sincronizacao': utc_now_iso()
                     }
                 }
         except Exception as rt_err:
@@ -941,7 +962,7 @@ class GoodWeClient:
             'meta_dados': {
                 'fonte_dados': 'GOODWE_SEMS_API',
                 'inverter_id': self.inverter_id,
-                'ultima_sincronizacao': datetime.utcnow().isoformat() + 'Z'
+                'ultima_sincronizacao': utc_now_iso()
             }
         }
 
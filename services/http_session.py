@@ -0,0 +1,27 @@
+"""
+Sessão HTTP compartilhada
+
+Uma única ``requests.Session`` por processo para as chamadas ao SEMS Portal
+(cliente GoodWe e scripts de diagnóstico). Reaproveitar a sessão mantém a
+conexão keep-alive aberta, evitando um novo handshake TCP+TLS a cada
+tentativa de login/consulta.
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def _build_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=4,
+        max_retries=Retry(total=3, backoff_factor=0.3),
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+SESSION = _build_session()
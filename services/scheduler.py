@@ -12,23 +12,32 @@ from __future__ import annotations
 
 import os
 import random
-from datetime import datetime
+import threading
+import uuid
+from datetime import datetime, timedelta
 from typing import Optional
 
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 import pytz
 
+from extensions import db
+from models.sync_job import SyncJob
 from utils.logger import get_logger
 from utils.energia import dispara_alerta
 from services.energy_autopilot import build_daily_plan
-from services.smartplug_service import collect_and_store
+from services.smartplug_service import collect_buffered
 from services.device_sync import sync_tuya_devices
 
 logger = get_logger(__name__)
 
 _scheduler: Optional[BackgroundScheduler] = None
 _started = False
+_leader_lock = None  # arquivo com flock mantido aberto pelo processo que roda o scheduler
+_reloader_active = False  # definido por app.py (__main__) quando inicia o reloader do Werkzeug
+
+# Jobs de sincronização (tabela sync_jobs) mais antigos que isso são descartados
+_SYNC_JOBS_RETENTION = timedelta(days=1)
 
 
 def _parse_hhmm(value: str, default: str) -> tuple[int, int]:
@@ -84,6 +93,35 @@ def job_morning_autopilot():
         logger.error(f"[Scheduler] Falha no anúncio do Autopilot: {e}")
 
 
+def set_reloader_active(active: bool) -> None:
+    """Informa, antes de criar o app, se este processo vai rodar sob o reloader."""
+    global _reloader_active
+    _reloader_active = active
+
+
+def _acquire_leader_lock(app) -> bool:
+    """Elege um único processo para rodar o scheduler (gunicorn -w N).
+
+    Cada worker chama ``init_scheduler`` ao criar o app; só quem obtém o flock
+    em ``instance/scheduler.lock`` agenda os jobs. O lock é liberado pelo SO
+    quando o processo termina, e o worker que o substituir o assume.
+    """
+    global _leader_lock
+    try:
+        import fcntl
+    except ImportError:  # Windows: sem gunicorn, um único processo
+        return True
+    os.makedirs(app.instance_path, exist_ok=True)
+    fh = open(os.path.join(app.instance_path, "scheduler.lock"), "w")
+    try:
+        fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        fh.close()
+        return False
+    _leader_lock = fh
+    return True
+
+
 def init_scheduler(app) -> Optional[BackgroundScheduler]:
     global _scheduler, _started
     if _started:
@@ -94,18 +132,29 @@ def init_scheduler(app) -> Optional[BackgroundScheduler]:
         logger.info("[Scheduler] Desativado por configuração (ENABLE_SCHEDULER=false)")
         return None
 
-    # Evitar inicializar duas vezes com reloader do Flask
-    if os.getenv("WERKZEUG_RUN_MAIN") != "true" and app.debug:
-        logger.info("[Scheduler] Aguardando reloader (modo debug)")
+    # Evitar inicializar duas vezes com reloader do Werkzeug: o processo pai só
+    # observa arquivos; o scheduler roda no filho (WERKZEUG_RUN_MAIN=true).
+    # O reloader fica ativo em modo debug ou quando o __main__ de app.py o inicia.
+    if (app.debug or _reloader_active) and os.getenv("WERKZEUG_RUN_MAIN") != "true":
+        logger.info("[Scheduler] Aguardando processo filho do reloader")
+        return None
+
+    if not _acquire_leader_lock(app):
+        logger.info(f"[Scheduler] Já ativo em outro processo; pid {os.getpid()} não agenda jobs")
         return None
 
     tz = _get_tz()
     scheduler = BackgroundScheduler(timezone=tz)
 
     # Funções wrapper para executar tarefas dentro do contexto da aplicação
+    try:
+        smartplug_flush_every = int(os.getenv("SMARTPLUG_FLUSH_EVERY", "1"))
+    except ValueError:
+        smartplug_flush_every = 1
+
     def collect_and_store_with_context():
         with app.app_context():
-            collect_and_store()
+            collect_buffered(smartplug_flush_every)
 
     def sync_tuya_devices_with_context():
         with app.app_context():
@@ -175,6 +224,62 @@ def init_scheduler(app) -> Optional[BackgroundScheduler]:
     return scheduler
 
 
+def enqueue_device_sync(app, usuario_id: Optional[int] = None, force_device_id: Optional[str] = None) -> str:
+    """Executa ``sync_tuya_devices`` em segundo plano e devolve o id do job.
+
+    Usa o APScheduler em execução (job único, sem trigger = roda agora); com o
+    scheduler desativado neste processo, cai para uma thread daemon. O
+    andamento fica na tabela ``sync_jobs`` (visível a todos os workers) e é
+    consultado com ``get_sync_job``. Requer app context.
+    """
+    job_id = f"tuya-sync-{uuid.uuid4().hex[:8]}"
+    db.session.execute(
+        db.delete(SyncJob).where(SyncJob.created_at < datetime.utcnow() - _SYNC_JOBS_RETENTION)
+    )
+    db.session.execute(db.insert(SyncJob).values(id=job_id, usuario_id=usuario_id, status="queued"))
+    db.session.commit()
+
+    def set_job(**values):
+        db.session.execute(db.update(SyncJob).where(SyncJob.id == job_id).values(**values))
+        db.session.commit()
+
+    def run():
+        with app.app_context():
+            try:
+                set_job(status="running")
+                stats = sync_tuya_devices(usuario_id=usuario_id, force_device_id=force_device_id)
+            except Exception as e:
+                db.session.rollback()
+                stats = {"error": str(e)}
+            status = "failed" if "error" in stats else "finished"
+            try:
+                set_job(status=status, result=stats)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"[Scheduler] {job_id}: falha ao gravar resultado: {e}")
+        logger.info(f"[Scheduler] {job_id}: {status} {stats}")
+
+    if _scheduler is not None:
+        _scheduler.add_job(run, id=job_id)
+    else:
+        threading.Thread(target=run, name=job_id, daemon=True).start()
+    return job_id
+
+
+def get_sync_job(job_id: str, usuario_id: int) -> Optional[dict]:
+    """Status/resultado do job, se existir e pertencer a ``usuario_id``. Requer app context."""
+    row = db.session.execute(
+        db.select(SyncJob.status, SyncJob.result)
+        .where(SyncJob.id == job_id, SyncJob.usuario_id == usuario_id)
+    ).first()
+    if row is None:
+        return None
+    job = {"status": row.status}
+    if row.result is not None:
+        job["result"] = row.result
+    return job
+
+
 def get_jobs_info():
     if not _scheduler:
         return []
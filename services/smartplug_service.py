@@ -1,16 +1,43 @@
 """Serviço de coleta e persistência da Smart Plug (Tuya)."""
 from __future__ import annotations
+import atexit
 import traceback
 from datetime import datetime
 from typing import Optional
 
+from flask import current_app
+
 from extensions import db
 from services.tuya_client import TuyaClient
 from models.smartplug_reading import SmartPlugReading
 from utils.logger import get_logger
+from utils.timefmt import utc_now_iso
 
 logger = get_logger(__name__)
 
+# Leituras do coletor periódico aguardando gravação em lote
+_BUFFER: list[dict] = []
+# Limite do buffer enquanto o banco estiver indisponível (descarta as mais antigas)
+_BUFFER_MAX = 1000
+_app = None  # app usado pelo flush no encerramento do processo
+
+
+def _read_snapshot(device_id: Optional[str] = None) -> dict:
+    """Consulta a smart plug e devolve a leitura como dicionário de colunas."""
+    client = TuyaClient(device_id=device_id)
+    status = client.get_device_status()
+    metrics = client.parse_metrics(status)
+    return {
+        'device_id': client.device_id or device_id or "unknown",
+        'created_at': datetime.utcnow(),
+        'power_w': metrics.get("power_w"),
+        'voltage_v': metrics.get("voltage_v"),
+        'current_a': metrics.get("current_a"),
+        'energy_wh': metrics.get("energy_wh"),
+        'raw_status': status.get("result"),
+    }
+
+
 def collect_and_store(device_id: Optional[str] = None) -> Optional[int]:
     """Coleta snapshot atual da smart plug e salva no banco.
 
@@ -18,18 +45,7 @@ def collect_and_store(device_id: Optional[str] = None) -> Optional[int]:
         ID do registro criado ou None em caso de falha.
     """
     try:
-        client = TuyaClient(device_id=device_id)
-        status = client.get_device_status()
-        metrics = client.parse_metrics(status)
-
-        reading = SmartPlugReading(
-            device_id=client.device_id or device_id or "unknown",
-            power_w=metrics.get("power_w"),
-            voltage_v=metrics.get("voltage_v"),
-            current_a=metrics.get("current_a"),
-            energy_wh=metrics.get("energy_wh"),
-            raw_status=status.get("result")
-        )
+        reading = SmartPlugReading(**_read_snapshot(device_id))
         db.session.add(reading)
         db.session.commit()
         logger.info(f"[SmartPlug] Leitura armazenada id={reading.id} device={reading.device_id} power={reading.power_w}")
@@ -39,6 +55,55 @@ def collect_and_store(device_id: Optional[str] = None) -> Optional[int]:
         db.session.rollback()
         return None
 
+def collect_buffered(flush_every: int = 1, device_id: Optional[str] = None) -> int:
+    """Coleta um snapshot e grava o buffer em lote a cada ``flush_every`` leituras.
+
+    Usado pelo job periódico (SMARTPLUG_FLUSH_EVERY). Com ``flush_every=1`` cada
+    leitura é gravada imediatamente.
+
+    Returns:
+        Quantidade de leituras gravadas nesta chamada (0 se ainda em buffer ou falha).
+    """
+    global _app
+    try:
+        _BUFFER.append(_read_snapshot(device_id))
+    except Exception as e:
+        logger.error(f"[SmartPlug] Falha ao coletar: {e}\n{traceback.format_exc()}")
+        return 0
+    if _app is None:
+        _app = current_app._get_current_object()
+        atexit.register(_flush_at_exit)
+    excedente = len(_BUFFER) - _BUFFER_MAX
+    if excedente > 0:
+        del _BUFFER[:excedente]
+        logger.warning(f"[SmartPlug] Buffer cheio: {excedente} leitura(s) mais antiga(s) descartada(s)")
+    if len(_BUFFER) < max(flush_every, 1):
+        return 0
+    return flush_buffer()
+
+
+def flush_buffer() -> int:
+    """Grava as leituras pendentes do buffer (um INSERT executemany + um commit)."""
+    if not _BUFFER:
+        return 0
+    rows = list(_BUFFER)
+    try:
+        saved = SmartPlugReading.bulk_insert(rows)
+    except Exception as e:
+        logger.error(f"[SmartPlug] Falha ao gravar lote de {len(rows)} leituras: {e}")
+        db.session.rollback()
+        return 0
+    del _BUFFER[:len(rows)]
+    logger.info(f"[SmartPlug] {saved} leitura(s) armazenada(s) em lote")
+    return saved
+
+
+def _flush_at_exit() -> None:
+    # Leituras ainda em buffer (SMARTPLUG_FLUSH_EVERY > 1) não se perdem no restart do worker
+    if _app is not None and _BUFFER:
+        with _app.app_context():
+            flush_buffer()
+
 def latest_readings(limit: int = 50):
     q = (SmartPlugReading.query
          .order_by(SmartPlugReading.created_at.desc())
@@ -60,5 +125,5 @@ def summary():
         'max_power_w': round(agg[2], 2) if agg[2] is not None else None,
         'avg_voltage_v': round(agg[3], 2) if agg[3] is not None else None,
         'avg_current_a': round(agg[4], 3) if agg[4] is not None else None,
-        'updated_at': datetime.utcnow().isoformat() + 'Z'
+        'updated_at': utc_now_iso()
     }
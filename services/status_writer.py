@@ -0,0 +1,81 @@
+"""Gravação em lote (write-behind) do status dos aparelhos.
+
+O polling do dashboard (/aparelhos/consumo-atual) descobre o estado real
+(ligado/desligado) das tomadas Tuya. Em vez de um commit por requisição, o
+status observado é enfileirado aqui e gravado a cada poucos segundos por uma
+thread daemon, em um único UPDATE ... CASE. Só o último status de cada
+aparelho é mantido, então o número de escritas acompanha as mudanças e não
+a quantidade de polls.
+"""
+from __future__ import annotations
+import atexit
+import threading
+import time
+
+from extensions import db
+from models.aparelho import Aparelho
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+FLUSH_INTERVAL = 2  # segundos
+
+_PENDING: dict[int, bool] = {}  # aparelho_id -> último status observado
+_LOCK = threading.Lock()
+_worker: threading.Thread | None = None
+_app = None
+
+
+def enqueue_status(app, aparelho_id: int, status: bool) -> None:
+    """Agenda a gravação de ``status`` para o aparelho (sobrescreve pendências anteriores)."""
+    global _worker, _app
+    with _LOCK:
+        _PENDING[aparelho_id] = status
+        if _worker is None:
+            _app = app
+            _worker = threading.Thread(target=_run, name='status-writer', daemon=True)
+            _worker.start()
+            atexit.register(_flush_at_exit)
+
+
+def flush_status_updates() -> int:
+    """Grava os status pendentes (um UPDATE + um commit). Requer app context.
+
+    Returns:
+        Quantidade de aparelhos atualizados.
+    """
+    with _LOCK:
+        pending = dict(_PENDING)
+        _PENDING.clear()
+    if not pending:
+        return 0
+    try:
+        result = db.session.execute(
+            db.update(Aparelho)
+            .where(Aparelho.id.in_(pending))
+            .values(status=db.case(pending, value=Aparelho.id))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+    except Exception as e:
+        logger.error(f"[StatusWriter] Falha ao gravar status de {len(pending)} aparelho(s): {e}")
+        db.session.rollback()
+        # Devolve para a fila sem sobrescrever observações mais novas
+        with _LOCK:
+            for aparelho_id, status in pending.items():
+                _PENDING.setdefault(aparelho_id, status)
+        return 0
+    return result.rowcount
+
+
+def _run() -> None:
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        with _app.app_context():
+            flush_status_updates()
+
+
+def _flush_at_exit() -> None:
+    if _app is not None and _PENDING:
+        with _app.app_context():
+            flush_status_updates()
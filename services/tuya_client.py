@@ -7,11 +7,13 @@ Documentação: https://developer.tuya.com
 """
 from __future__ import annotations
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import time
 import logging
 from typing import Any, Dict, Optional
 
-from dotenv import load_dotenv
+from env_cache import load_env_once
 
 try:
     from tuya_connector import TuyaOpenAPI, TuyaOpenPulsar  # type: ignore
@@ -22,7 +24,7 @@ except ImportError:  # Biblioteca ainda não instalada
     TuyaOpenPulsar = object  # type: ignore
     _TUYA_LIB_OK = False
 
-load_dotenv()
+load_env_once()
 logger = logging.getLogger(__name__)
 
 
@@ -95,6 +97,18 @@ class TuyaClient:
             logger.error(f"Erro ao obter status device Tuya {device_id}: {e}")
             return {"error": str(e)}
 
+    def get_device_statuses(self, device_ids, max_workers: int = 8) -> Dict[str, Dict[str, Any]]:
+        """Status de vários devices de uma vez ({device_id: resposta}).
+
+        Um GET por device (mesmo formato de ``get_device_status_by_id``), feitos
+        em paralelo: o tempo total fica próximo ao da chamada mais lenta.
+        """
+        ids = list(dict.fromkeys(device_ids))
+        if len(ids) <= 1:
+            return {device_id: self.get_device_status_by_id(device_id) for device_id in ids}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(ids))) as pool:
+            return dict(zip(ids, pool.map(self.get_device_status_by_id, ids)))
+
     def list_devices(self, include_raw: bool = False) -> Dict[str, Any]:
         """Lista dispositivos vinculados.
 
@@ -307,6 +321,24 @@ class TuyaClient:
             return {"error": str(e)}
 
 
+_shared_client: Optional[TuyaClient] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_client() -> TuyaClient:
+    """Instância única (por processo) do TuyaClient com as credenciais do .env.
+
+    Evita reconectar na OpenAPI (login/token) a cada requisição; a sessão HTTP
+    da biblioteca é reaproveitada entre chamadas.
+    """
+    global _shared_client
+    if _shared_client is None:
+        with _shared_lock:
+            if _shared_client is None:
+                _shared_client = TuyaClient()
+    return _shared_client
+
+
 if __name__ == "__main__":
     # Teste rápido manual (não chamar em produção)
     try:
@@ -0,0 +1,69 @@
+"""
+Verificação de código duplicado - SolarMind
+
+Falha (exit 1) quando encontra:
+- arquivos .py com conteúdo idêntico (cópias de app.py, config.py etc.);
+- definições de nível de módulo (def/class) repetidas no mesmo arquivo,
+  que fazem a última cópia sobrescrever silenciosamente a anterior.
+
+Uso:
+    python tools/dedupe_check.py [diretorio]
+"""
+
+import ast
+import hashlib
+import os
+import sys
+from collections import defaultdict
+
+IGNORED_DIRS = {'.git', '__pycache__', 'venv', '.venv', 'node_modules', 'instance'}
+
+
+def iter_python_files(root: str):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in IGNORED_DIRS]
+        for filename in filenames:
+            if filename.endswith('.py'):
+                yield os.path.join(dirpath, filename)
+
+
+def duplicated_definitions(source: str) -> list[str]:
+    """Retorna nomes de funções/classes definidos mais de uma vez no módulo."""
+    seen: dict[str, int] = defaultdict(int)
+    for node in ast.parse(source).body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            seen[node.name] += 1
+    return sorted(name for name, count in seen.items() if count > 1)
+
+
+def main(root: str = '.') -> int:
+    by_hash: dict[str, list[str]] = defaultdict(list)
+    problems = 0
+
+    for path in iter_python_files(root):
+        with open(path, 'rb') as fh:
+            raw = fh.read()
+        if raw.strip():
+            by_hash[hashlib.sha1(raw).hexdigest()].append(path)
+        try:
+            dups = duplicated_definitions(raw.decode('utf-8'))
+        except (SyntaxError, UnicodeDecodeError):
+            continue
+        if dups:
+            problems += 1
+            print(f"[DUP] {path}: definições repetidas: {', '.join(dups)}")
+
+    for paths in by_hash.values():
+        if len(paths) > 1:
+            problems += 1
+            print(f"[DUP] Arquivos idênticos: {', '.join(sorted(paths))}")
+
+    if problems:
+        print(f"❌ {problems} duplicação(ões) encontrada(s)")
+        return 1
+    print("✅ Nenhuma duplicação encontrada")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1] if len(sys.argv) > 1 else '.'))
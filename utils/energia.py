@@ -9,15 +9,20 @@ import os
 import requests
 import schedule
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, List, Optional, Union
-from dotenv import load_dotenv
 
-load_dotenv()
+from env_cache import load_env_once
+
+load_env_once()
 
 IFTTT_KEY = os.getenv("IFTTT_KEY")
 DEFAULT_ENERGY_RATE = 0.95  # R$ per kWh
 
+# Dedicated pool for outbound IFTTT webhooks, so alerts never hold up the caller
+_WEBHOOK_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix='ifttt-webhook')
+
 
 def dispara_alerta(evento: str, mensagem: str) -> bool:
     """
@@ -42,6 +47,20 @@ def dispara_alerta(evento: str, mensagem: str) -> bool:
         return False
 
 
+def dispara_alerta_async(evento: str, mensagem: str) -> Future:
+    """
+    Queue an IFTTT alert on the webhook pool and return immediately.
+    
+    Args:
+        evento: IFTTT event name
+        mensagem: Alert message content
+        
+    Returns:
+        Future: Resolves to the dispara_alerta result
+    """
+    return _WEBHOOK_EXECUTOR.submit(dispara_alerta, evento, mensagem)
+
+
 def calcular_custo(consumo_kwh: float, tarifa: float = DEFAULT_ENERGY_RATE) -> float:
     """
     Calculate energy cost in Brazilian Reais.
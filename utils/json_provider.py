@@ -0,0 +1,52 @@
+"""
+JSON provider for Flask backed by orjson.
+
+Every ``jsonify(...)`` in the blueprints goes through ``app.json``; this
+provider swaps the pure-Python ``json`` encoder/decoder for orjson (C/Rust
+extension) without touching call sites. When orjson is not installed the
+provider behaves exactly like Flask's default one.
+"""
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    _ORJSON_OK = True
+except ImportError:  # orjson é opcional; cai no json da stdlib
+    orjson = None  # type: ignore
+    _ORJSON_OK = False
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """DefaultJSONProvider that serializes with orjson when available."""
+
+    def _options(self, indent: bool, sort_keys: bool) -> int:
+        # Same output rules as Flask's default: non-str keys are stringified and
+        # datetimes go through Flask's ``default`` (HTTP date format).
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    def dumps(self, obj, **kwargs) -> str:
+        if not _ORJSON_OK:
+            return super().dumps(obj, **kwargs)
+        option = self._options(bool(kwargs.get('indent')), kwargs.get('sort_keys', self.sort_keys))
+        return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if not _ORJSON_OK or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if not _ORJSON_OK:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        option = self._options(indent, self.sort_keys) | orjson.OPT_APPEND_NEWLINE
+        # orjson já devolve bytes UTF-8: vai direto para o corpo da resposta
+        body = orjson.dumps(obj, default=self.default, option=option)
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -20,10 +20,10 @@ def setup_logger(app: Flask, log_level: str = 'INFO') -> None:
         app: Flask application instance
         log_level: Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
     """
-    # Create logs directory if it doesn't exist
-    logs_dir = 'logs'
-    if not os.path.exists(logs_dir):
-        os.makedirs(logs_dir)
+    # Create logs directory if it doesn't exist (anchored at the app root,
+    # not the current working directory)
+    logs_dir = os.path.join(app.root_path, 'logs')
+    os.makedirs(logs_dir, exist_ok=True)
     
     # Configure file handler
     log_file = os.path.join(logs_dir, 'solarmind.log')
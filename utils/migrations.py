@@ -1,6 +1,6 @@
 """Lightweight migration helpers for SQLite.
 
-Currently adds new columns to existing tables when they are missing.
+Currently adds new columns and indexes to existing tables when they are missing.
 This avoids introducing a full migration framework (Alembic) right now.
 
 Usage: call apply_migrations(app) after db.create_all().
@@ -10,7 +10,7 @@ from extensions import db
 
 
 def _column_exists(table: str, column: str) -> bool:
-    cur = db.session.execute(f"PRAGMA table_info({table})")
+    cur = db.session.execute(db.text(f"PRAGMA table_info({table})"))
     for row in cur:  # row: (cid, name, type, notnull, dflt_value, pk)
         if row[1] == column:
             return True
@@ -19,11 +19,67 @@ def _column_exists(table: str, column: str) -> bool:
 
 def _add_column(table: str, column_def: str):
     # SQLite supports simple ADD COLUMN (always adds at end)
-    db.session.execute(f"ALTER TABLE {table} ADD COLUMN {column_def}")
+    db.session.execute(db.text(f"ALTER TABLE {table} ADD COLUMN {column_def}"))
+
+
+def _index_exists(name: str) -> bool:
+    row = db.session.execute(
+        db.text("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = :name"),
+        {'name': name},
+    ).first()
+    return row is not None
+
+
+def _create_index(name: str, table: str, columns: str, unique: bool = False):
+    kind = 'UNIQUE INDEX' if unique else 'INDEX'
+    db.session.execute(db.text(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({columns})"))
+
+
+def _drop_index(name: str):
+    db.session.execute(db.text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def _backfill_slugs() -> int:
+    """Preenche aparelhos.slug para linhas antigas (slug nulo)."""
+    from utils.slug import slugify
+    rows = db.session.execute(db.text("SELECT id, nome FROM aparelhos WHERE slug IS NULL")).all()
+    if rows:
+        db.session.execute(
+            db.text("UPDATE aparelhos SET slug = :slug WHERE id = :id"),
+            [{'id': row[0], 'slug': slugify(row[1])} for row in rows],
+        )
+    return len(rows)
+
+
+def _rename_duplicate_names() -> int:
+    """Renomeia aparelhos com nome repetido para o mesmo usuário ("Nome (id)").
+
+    A primeira linha (menor id) de cada grupo mantém o nome, para que o índice
+    único uq_aparelhos_user_nome sempre possa ser criado.
+    """
+    from utils.slug import slugify
+    rows = db.session.execute(db.text(
+        "SELECT a.id, a.usuario_id, a.nome FROM aparelhos a "
+        "WHERE EXISTS (SELECT 1 FROM aparelhos b WHERE b.usuario_id = a.usuario_id "
+        "AND b.nome = a.nome AND b.id < a.id)"
+    )).all()
+    for aparelho_id, usuario_id, nome in rows:
+        novo = f"{nome} ({aparelho_id})"
+        while db.session.execute(
+            db.text("SELECT 1 FROM aparelhos WHERE usuario_id = :u AND nome = :n"),
+            {'u': usuario_id, 'n': novo},
+        ).first():
+            novo = f"{novo} ({aparelho_id})"
+        db.session.execute(
+            db.text("UPDATE aparelhos SET nome = :nome, slug = :slug WHERE id = :id"),
+            {'id': aparelho_id, 'nome': novo, 'slug': slugify(novo)},
+        )
+        print(f"[MIGRATIONS] aparelho {aparelho_id}: nome repetido '{nome}' renomeado para '{novo}'")
+    return len(rows)
 
 
 def apply_migrations():  # no app arg needed when called inside app_context
-    """Run idempotent column additions."""
+    """Run idempotent column and index changes."""
     # aparelhos: add codigo_externo, origem
     changes: list[str] = []
     if _column_exists('aparelhos', 'id'):  # table exists
@@ -33,6 +89,30 @@ def apply_migrations():  # no app arg needed when called inside app_context
         if not _column_exists('aparelhos', 'origem'):
             _add_column('aparelhos', 'origem VARCHAR(30)')
             changes.append('aparelhos.origem')
+        if not _column_exists('aparelhos', 'slug'):
+            _add_column('aparelhos', 'slug VARCHAR(120)')
+            changes.append('aparelhos.slug')
+        if _backfill_slugs():
+            changes.append('aparelhos.slug (backfill)')
+        if not _index_exists('ix_aparelhos_user_slug'):
+            _create_index('ix_aparelhos_user_slug', 'aparelhos', 'usuario_id, slug')
+            changes.append('aparelhos.ix_aparelhos_user_slug')
+        # Nome único por usuário (também serve os lookups por usuário + nome)
+        if not _index_exists('uq_aparelhos_user_nome'):
+            if _rename_duplicate_names():
+                changes.append('aparelhos.nome (duplicados renomeados)')
+            _create_index('uq_aparelhos_user_nome', 'aparelhos', 'usuario_id, nome', unique=True)
+            changes.append('aparelhos.uq_aparelhos_user_nome')
+        if _index_exists('uq_aparelhos_user_nome') and _index_exists('ix_aparelhos_user_nome'):
+            _drop_index('ix_aparelhos_user_nome')
+            changes.append('aparelhos.ix_aparelhos_user_nome (dropped)')
+        # Índice de expressão para buscas case-insensitive (lower(nome) = ...)
+        if not _index_exists('ix_aparelhos_lower_nome'):
+            _create_index('ix_aparelhos_lower_nome', 'aparelhos', 'lower(nome), usuario_id')
+            changes.append('aparelhos.ix_aparelhos_lower_nome')
+        if _index_exists('ix_aparelhos_nome'):
+            _drop_index('ix_aparelhos_nome')
+            changes.append('aparelhos.ix_aparelhos_nome (dropped)')
     if changes:
         db.session.commit()
     else:
@@ -0,0 +1,28 @@
+"""
+Slug de nomes de aparelhos.
+
+Mesmo formato usado como endpointId no Discovery da Alexa: apenas [a-z0-9]
+separados por '-'. O valor é persistido em ``Aparelho.slug`` para buscas
+por igualdade (indexadas) em vez de ILIKE.
+"""
+
+import re
+
+
+class _SlugTable(dict):
+    """Tabela do str.translate: [a-z0-9] ficam, qualquer outro caractere vira '-'."""
+
+    def __missing__(self, codepoint):
+        return '-'
+
+
+_SLUG_TABLE = _SlugTable({ord(c): c for c in 'abcdefghijklmnopqrstuvwxyz0123456789'})
+_SLUG_DASHES = re.compile(r'-+')
+
+
+def slugify(text: str) -> str:
+    if not text:
+        return ''
+    t = text.lower().strip().translate(_SLUG_TABLE)
+    t = _SLUG_DASHES.sub('-', t).strip('-')
+    return t or text.lower()
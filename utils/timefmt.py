@@ -0,0 +1,24 @@
+"""
+Timestamps UTC em ISO 8601 para respostas JSON.
+
+Formato único (ex: ``2024-05-01T12:00:00.123Z``) usado pela Alexa
+(``timeOfSample``) e pelos campos ``timestamp``/``ultima_atualizacao`` das
+APIs. A parte até os segundos só é recalculada quando o segundo muda.
+"""
+
+import time
+
+# (segundo epoch, 'YYYY-MM-DDTHH:MM:SS') do último timestamp gerado
+_SECOND_PREFIX: tuple[int, str] = (-1, '')
+
+
+def utc_now_iso() -> str:
+    """Horário UTC atual em ISO 8601 com milissegundos e sufixo Z."""
+    global _SECOND_PREFIX
+    now = time.time()
+    second = int(now)
+    cached_second, prefix = _SECOND_PREFIX
+    if second != cached_second:
+        prefix = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(second))
+        _SECOND_PREFIX = (second, prefix)
+    return f'{prefix}.{int(now * 1000) % 1000:03d}Z'